@@ -0,0 +1,263 @@
+# Python 3.7.1 - vectorized price history analytics with numpy
+
+from datetime import datetime
+import json
+import os
+
+import numpy as np
+
+from records import FUELS
+
+COLUMNS = ('timestamp', 'station', 'fuel', 'cents')
+STATION_SHIFT = 34 # group keys: station code above 34 bits of seconds
+DAY = 24 * 3600
+
+class PriceArrays:
+    """
+    Columns of every price a PriceStore holds for one zip code, as numpy
+    arrays sorted by station, fuel and timestamp.
+
+    load() caches the columns as .npy files in '{fp}/{zipcode}/_arrays' and
+    memory maps them, so only the pages a query touches are read. The cache
+    is rebuilt when the day partitions it was built from change.
+
+    Args:
+        timestamp (ndarray): int64 epoch seconds.
+        station (ndarray): int32 index into stations.
+        fuel (ndarray): int8 index into records.FUELS.
+        cents (ndarray): int32 prices.
+        stations (lst): station names and addresses.
+    """
+
+    def __init__(self, timestamp, station, fuel, cents, stations):
+        self.timestamp = timestamp
+        self.station = station
+        self.fuel = fuel
+        self.cents = cents
+        self.stations = stations
+
+    def __len__(self):
+        return len(self.cents)
+
+    @classmethod
+    def from_store(cls, store, zipcode):
+        '''Reads the csv partitions of a zip code into sorted arrays'''
+
+        codes = {} # station: code, in order of appearance
+        timestamps, stations, fuels, cents = [], [], [], []
+        fuel_codes = {fuel: i for i, fuel in enumerate(FUELS)}
+
+        for timestamp, station, fuel, price in store.read(zipcode):
+            timestamps.append(timestamp)
+            stations.append(codes.setdefault(station, len(codes)))
+            fuels.append(fuel_codes[fuel])
+            cents.append(price)
+
+        timestamp = np.array(timestamps, dtype=np.int64)
+        station = np.array(stations, dtype=np.int32)
+        fuel = np.array(fuels, dtype=np.int8)
+        order = np.lexsort((timestamp, fuel, station))
+
+        return cls(timestamp[order], station[order], fuel[order],
+            np.array(cents, dtype=np.int32)[order], list(codes))
+
+    @classmethod
+    def load(cls, store, zipcode, cache=True):
+        """
+        Returns the arrays of a zip code, memory mapped from the cache when it
+        is up to date.
+
+        Args:
+            store (PriceStore): store the zip code was written to.
+            zipcode (str): zip code folder.
+            cache (bool, optional): read and write '{fp}/{zipcode}/_arrays'.
+        """
+
+        if not cache:
+            return cls.from_store(store, zipcode)
+
+        folder = os.path.join(store.fp, zipcode, '_arrays')
+        meta_fp = os.path.join(folder, 'meta.json')
+        source = [[os.path.basename(path), os.path.getsize(path)]
+            for path in store.files(zipcode)]
+
+        if os.path.isfile(meta_fp):
+            with open(meta_fp) as meta_file:
+                meta = json.load(meta_file)
+
+            if meta['source'] == source:
+                return cls(*(np.load(os.path.join(folder, name + '.npy'),
+                    mmap_mode='r') for name in COLUMNS), meta['stations'])
+
+        arrays = cls.from_store(store, zipcode)
+        arrays.save(folder, source)
+
+        return arrays
+
+    def save(self, folder, source):
+        '''Writes the columns and the partitions they came from to folder'''
+
+        if not os.path.isdir(folder):
+            os.makedirs(folder)
+
+        for name in COLUMNS:
+            path = os.path.join(folder, name + '.npy')
+            with open(path + '.tmp', 'wb') as npy_file:
+                np.save(npy_file, getattr(self, name))
+            os.replace(path + '.tmp', path)
+
+        # written last: a cache interrupted midway is rebuilt next time
+        meta_fp = os.path.join(folder, 'meta.json')
+        with open(meta_fp + '.tmp', 'w') as meta_file:
+            json.dump(dict(source=source, stations=self.stations), meta_file)
+        os.replace(meta_fp + '.tmp', meta_fp)
+
+    def select(self, fuel=None, start=None, end=None):
+        """
+        Returns the rows of one fuel type between start and end (epoch
+        seconds, end excluded), still sorted by station and timestamp.
+        """
+
+        mask = np.ones(len(self), dtype=bool)
+
+        if fuel is not None:
+            mask &= self.fuel == FUELS.index(fuel)
+        if start is not None:
+            mask &= self.timestamp >= start
+        if end is not None:
+            mask &= self.timestamp < end
+
+        return PriceArrays(self.timestamp[mask], self.station[mask],
+            self.fuel[mask], self.cents[mask], self.stations)
+
+    def _groups(self):
+        '''Returns (first row, rows) of every station in the arrays'''
+
+        starts = np.flatnonzero(np.r_[True, np.diff(self.station) != 0])
+        return starts, np.diff(np.r_[starts, len(self)])
+
+    def station_stats(self, fuel, start=None, end=None,
+        percentiles=(10, 50, 90)):
+        """
+        Price statistics of every station for one fuel type.
+
+        Returns:
+            dict: {station: {count, min, max, mean, p10, ..., changes}} in
+                cents; changes counts the observations that differed from the
+                one before.
+        """
+
+        rows = self.select(fuel, start, end)
+        if not len(rows):
+            return {}
+
+        starts, counts = rows._groups()
+        cents = rows.cents.astype(np.float64)
+
+        stats = dict(
+            count=counts,
+            min=np.minimum.reduceat(rows.cents, starts),
+            max=np.maximum.reduceat(rows.cents, starts),
+            mean=np.add.reduceat(cents, starts) / counts,
+        )
+
+        # same station and a different price than the previous row
+        changed = np.r_[False, (np.diff(rows.cents) != 0) &
+            (np.diff(rows.station) == 0)]
+        stats['changes'] = np.add.reduceat(changed.astype(np.int64), starts)
+
+        # prices sorted within each station, interpolated like np.percentile
+        ranked = cents[np.lexsort((rows.cents, rows.station))]
+        for q in percentiles:
+            position = starts + q / 100 * (counts - 1)
+            low = np.floor(position).astype(np.int64)
+            high = np.ceil(position).astype(np.int64)
+            stats['p' + str(q)] = ranked[low] + \
+                (ranked[high] - ranked[low]) * (position - low)
+
+        names = [rows.stations[i] for i in rows.station[starts]]
+        return {name: {key: values[i].item() for key, values in stats.items()}
+            for i, name in enumerate(names)}
+
+    def zip_stats(self, fuel, start=None, end=None, percentiles=(10, 50, 90)):
+        '''Same statistics as station_stats() over every station at once'''
+
+        rows = self.select(fuel, start, end)
+        if not len(rows):
+            return {}
+
+        changed = (np.diff(rows.cents) != 0) & (np.diff(rows.station) == 0)
+        stats = dict(count=len(rows), stations=len(np.unique(rows.station)),
+            min=rows.cents.min().item(), max=rows.cents.max().item(),
+            mean=rows.cents.mean().item(), changes=int(changed.sum()))
+
+        for q, value in zip(percentiles, np.percentile(rows.cents, percentiles)):
+            stats['p' + str(q)] = value.item()
+
+        return stats
+
+    def rolling_mean(self, fuel, window=7*DAY, start=None, end=None):
+        """
+        Mean price of each station over the window seconds up to and
+        including every observation.
+
+        Returns:
+            tuple: (station codes, timestamps, means) aligned arrays
+        """
+
+        rows = self.select(fuel, start, end)
+        if not len(rows):
+            return rows.station, rows.timestamp, np.zeros(0)
+
+        # one sorted key per row so a searchsorted finds every window start
+        offset = rows.timestamp - rows.timestamp.min()
+        group = rows.station.astype(np.int64) << STATION_SHIFT
+        key = group | offset
+        first = np.searchsorted(key, group | np.maximum(0, offset - window + 1))
+
+        total = np.r_[0, np.cumsum(rows.cents, dtype=np.int64)]
+        last = np.arange(1, len(rows) + 1)
+        means = (total[last] - total[first]) / (last - first)
+
+        return rows.station, rows.timestamp, means
+
+    def daily_mean(self, fuel, start=None, end=None):
+        """
+        Mean price of all stations per local day.
+
+        Returns:
+            tuple: (datetime64[D] days, means); days without prices are nan
+        """
+
+        rows = self.select(fuel, start, end)
+        if not len(rows):
+            return np.zeros(0, dtype='datetime64[D]'), np.zeros(0)
+
+        days = (rows.timestamp + local_offset(rows.timestamp)) // DAY
+        first = days.min()
+        sums = np.bincount(days - first, weights=rows.cents)
+        counts = np.bincount(days - first)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = sums / counts
+
+        return np.arange(first, first + len(sums)).astype('datetime64[D]'), means
+
+def local_offset(timestamps):
+    '''Seconds to add to epoch timestamps to get local time, per timestamp'''
+
+    # the offset only changes twice a year, so look it up once per hour
+    hours, inverse = np.unique(timestamps // 3600, return_inverse=True)
+    offsets = np.array([
+        int((datetime.fromtimestamp(h * 3600) -
+            datetime.utcfromtimestamp(h * 3600)).total_seconds())
+        for h in hours.tolist()
+    ], dtype=np.int64)
+
+    return offsets[inverse]
+
+def summarize(store, zipcodes, fuel='regular', start=None, end=None):
+    '''Returns {zipcode: zip_stats()} for several zip codes'''
+
+    return {zipcode: PriceArrays.load(store, zipcode).zip_stats(fuel, start, end)
+        for zipcode in zipcodes}
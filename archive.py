@@ -0,0 +1,182 @@
+# Python 3.7.1 - compressed archive of raw sidebar captures and bulk re-parsing
+
+from datetime import datetime
+from multiprocessing import Pool
+import gzip
+import json
+import os
+import threading
+import zlib
+
+from pricestore import PriceStore
+from records import PARSERS
+
+class CaptureArchive:
+    """
+    Every raw 'section-gas-prices-container' text and place url tours
+    captured, so their prices can be parsed again instead of scraped again,
+    e.g. once a parsing bug is found. See reparse().
+
+    Captures are buffered and appended as a gzip member to
+    '{fp}/captures_{YYYY-MM-DD}.jsonl.gz', one file per local day, as json
+    lines of ts, loc, zip, url and text. Written members are never rewritten;
+    a crash loses the buffered captures at most.
+
+    Args:
+        fp (str, optional): directory of the archive.
+        batch_size (int, optional): buffered captures that trigger a flush().
+    """
+
+    def __init__(self, fp=os.path.join('fuel_prices', '_archive'),
+        batch_size=500):
+        self.fp = fp
+        self.batch_size = batch_size
+        self.lock = threading.Lock()
+        self.buffer = {} # gz path: [json lines]
+        self.buffered = 0
+
+    def path(self, timestamp):
+        day = datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d')
+        return os.path.join(self.fp, 'captures_' + day + '.jsonl.gz')
+
+    def add(self, zipcode, loc, text, url, timestamp):
+        """
+        Buffers a capture.
+
+        Args:
+            zipcode (str): zip code folder the station belongs to.
+            loc (str): station name and address.
+            text (str): raw prices container text.
+            url (str): place url, with the coordinates.
+            timestamp (float): epoch seconds of the capture.
+        """
+
+        line = json.dumps(dict(ts=int(timestamp), loc=loc, zip=zipcode, url=url,
+            text=text))
+
+        with self.lock:
+            self.buffer.setdefault(self.path(timestamp), []).append(line)
+            self.buffered += 1
+            full = self.buffered >= self.batch_size
+
+        if full:
+            self.flush()
+
+    def flush(self):
+        '''Appends the buffered captures as new gzip members'''
+
+        with self.lock:
+            buffer, self.buffer, self.buffered = self.buffer, {}, 0
+
+            if buffer and not os.path.isdir(self.fp):
+                os.makedirs(self.fp)
+
+            for path, lines in buffer.items():
+                with gzip.open(path, 'at', encoding='utf-8') as gz_file:
+                    gz_file.write('\n'.join(lines) + '\n')
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def files(self, start=None, end=None):
+        """
+        Returns the day files of the archive in date order.
+
+        Args:
+            start (str, optional): first day, 'YYYY-MM-DD'.
+            end (str, optional): last day, 'YYYY-MM-DD'.
+        """
+
+        if not os.path.isdir(self.fp):
+            return []
+
+        return [os.path.join(self.fp, name) for name in sorted(os.listdir(self.fp))
+            if name.startswith('captures_') and name.endswith('.jsonl.gz')
+            and (start is None or name[9:19] >= start)
+            and (end is None or name[9:19] <= end)]
+
+def read_captures(path):
+    """
+    Yields the captures of an archive file as dicts, in the order they were
+    written. A member cut short by a crash ends the file instead of failing.
+    """
+
+    with gzip.open(path, 'rt', encoding='utf-8') as gz_file:
+        try:
+            for line in gz_file:
+                yield json.loads(line)
+        except (EOFError, zlib.error, ValueError):
+            print(path, "ends with a truncated capture.")
+
+def reparse_file(path, store_fp, parser='labels'):
+    """
+    Parses one day file of the archive and replaces the stored prices of its
+    captures in the store partitions of that day. Rows that were not
+    archived, e.g. written by scheduler.py or 'check --no-archive', are kept.
+
+    Returns:
+        tuple: (path, captures parsed)
+    """
+
+    parse = PARSERS[parser]
+    store = PriceStore(store_fp, batch_size=float('inf')) # one flush per day
+    replaced = set() # (zip, ts, loc) of the captures
+    count = 0
+
+    for capture in read_captures(path):
+        store.add_prices(capture['zip'], capture['loc'],
+            parse(capture['text'], capture['ts']))
+        replaced.add((capture['zip'], capture['ts'], capture['loc']))
+        count += 1
+
+    store.flush(replace=replaced)
+
+    return path, count
+
+def _reparse_file(args):
+    return reparse_file(*args)
+
+def reparse(archive, store_fp, parser='labels', processes=None, start=None,
+    end=None):
+    """
+    Rebuilds the price store from the archive, one day file per process.
+
+    Each day's partitions are written by the one process that parsed the
+    day, so processes never append to the same csv file. Only the rows of
+    archived captures are replaced; days that are not in the archive and
+    rows that were never archived are left as they are.
+
+    Args:
+        archive (CaptureArchive): captures to replay.
+        store_fp (str): directory of the PriceStore to rebuild.
+        parser (str, optional): key of records.PARSERS.
+        processes (int, optional): worker processes, os.cpu_count() if None.
+        start (str, optional): first day to replay, 'YYYY-MM-DD'.
+        end (str, optional): last day to replay, 'YYYY-MM-DD'.
+
+    Returns:
+        int: captures parsed
+    """
+
+    jobs = [(path, store_fp, parser) for path in archive.files(start, end)]
+    pool = Pool(processes) if processes != 1 and len(jobs) > 1 else None
+    results = map(_reparse_file, jobs) if pool is None else \
+        pool.imap_unordered(_reparse_file, jobs)
+    total = 0
+
+    try:
+        for path, count in results:
+            total += count
+            print(os.path.basename(path), count, "captures parsed.")
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    return total
@@ -0,0 +1,123 @@
+# Python 3.7.1 - offline throughput benchmarks against fakedriver.FakeMaps
+
+import argparse
+import contextlib
+import io
+import os
+from time import perf_counter
+
+from fakedriver import FakeMaps
+from helpfuncs import GasPriceChecker, GasStationScraper, read_addresses
+
+try:
+    import resource # not available on windows
+except ImportError:
+    resource = None
+
+def peak_rss_mb():
+    '''Returns the peak resident set size of this process in MB, or None'''
+
+    if resource is None:
+        return None
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def percentile(values, pct):
+    '''Returns the pct percentile of values (nearest rank)'''
+
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def run(name, maps, func):
+    """
+    Runs func with stdout silenced and prints its benchmark report.
+
+    Args:
+        name (str): name of the benchmark
+        maps (FakeMaps): map the drivers in func are using
+        func (callable): returns the number of stations it scraped
+    """
+
+    maps.reset_stats()
+
+    started = perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        stations = func()
+    elapsed = perf_counter() - started
+
+    rss = peak_rss_mb()
+
+    print('{}: {} stations in {:.3f}s, {:.1f} stations/sec'.format(
+        name, stations, elapsed, stations / elapsed if elapsed else 0
+    ))
+    print('  commands: {}, page loads: {}, peak rss: {}'.format(
+        maps.commands, maps.page_loads,
+        '{:.1f} MB'.format(rss) if rss is not None else 'n/a'
+    ))
+
+    for command, times in sorted(maps.step_times.items()):
+        print('  {:<16} n={:<6} mean={:.2f}ms p95={:.2f}ms'.format(
+            command, len(times), 1000 * sum(times) / len(times),
+            1000 * percentile(times, 95)
+        ))
+
+def bench_check(maps, fp, pool_size):
+    checker = GasPriceChecker(
+        'https://www.google.com/maps', GasPriceChecker.xpaths, fp,
+        driver_factory=maps.new_driver
+    )
+
+    if pool_size > 1:
+        return len(checker.check_pooled(pool_size))
+
+    return len(checker.check()) # stations checked, not listed
+
+def bench_get_results(maps, depth):
+    gss = GasStationScraper(None, '85364', depth, maps.new_driver)
+    gss.init_driver(True, None)
+
+    for search in [gss.zipcode, 'gas stations']:
+        gss.find_and_click_field(
+            gss.xpaths['searchField'], gss.xpaths['searchButton'], search, True
+        )
+
+    maps.reset_stats() # only time the results scraping
+    return len(gss.get_results())
+
+def bench_scrape(maps, depth):
+    gss = GasStationScraper(None, '85364', depth, maps.new_driver)
+    return len(gss.scrape())
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmarks the scrapers offline against a fake google maps'
+    )
+    parser.add_argument('--addresses', default='gas_stations.txt',
+        help='gas station list the fake map is built from')
+    parser.add_argument('--fixture', help='json map saved by FakeMaps.save')
+    parser.add_argument('--latency', type=float, default=0.0,
+        help='seconds per WebDriver command')
+    parser.add_argument('--load-latency', type=float, default=0.0,
+        help='extra seconds per page load')
+    parser.add_argument('--pool', type=int, default=1,
+        help='driver pool size for check()')
+    parser.add_argument('--depth', type=int, default=20,
+        help='stations to scrape from the results pages')
+    args = parser.parse_args()
+
+    kwargs = dict(latency=args.latency, load_latency=args.load_latency)
+    if args.fixture:
+        maps = FakeMaps.load(args.fixture, **kwargs)
+    else:
+        maps = FakeMaps.from_addresses(
+            read_addresses(args.addresses), decoys=5, **kwargs
+        )
+
+    fp = os.path.abspath(args.addresses)
+
+    run('check', maps, lambda: bench_check(maps, fp, args.pool))
+    run('get_results', maps, lambda: bench_get_results(maps, args.depth))
+    run('scrape', maps, lambda: bench_scrape(maps, args.depth))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+# Python 3.7.1 - benchmark of analytics.PriceArrays on a synthetic price history
+
+import argparse
+import random
+import shutil
+import statistics
+import tempfile
+from time import perf_counter, time
+
+from analytics import DAY, PriceArrays
+from pricestore import PriceStore
+from records import GasPrices
+
+def generate(store, zipcode, stations, days, per_day, seed=0):
+    """
+    Writes days of checks of stations to store, per_day checks a day, with
+    prices that random walk a few cents at a time.
+
+    Returns:
+        int: rows written
+    """
+
+    rng = random.Random(seed)
+    start = int(time()) - days * DAY
+    prices = [rng.randint(250, 400) for _ in range(stations)]
+    names = ['Station {} {} Main St, Yuma, AZ {}'.format(i, 100 + i, zipcode)
+        for i in range(stations)]
+    rows = 0
+
+    for check in range(days * per_day):
+        timestamp = start + check * DAY // per_day
+
+        for i, name in enumerate(names):
+            if rng.random() < 0.1: # a price change
+                prices[i] = max(150, prices[i] + rng.choice((-10, -5, 3, 5, 10)))
+
+            reg = prices[i]
+            store.add_prices(zipcode, name, GasPrices(
+                reg + 60, reg, reg + 40, reg + 70, timestamp
+            ))
+            rows += 4
+
+    store.flush()
+    return rows
+
+def timed(name, func):
+    started = perf_counter()
+    result = func()
+    print('  {:<28} {:>9.1f} ms'.format(name, 1000 * (perf_counter() - started)))
+    return result
+
+def python_station_stats(store, zipcode, fuel):
+    '''Baseline: the same means and medians by reading the csv row by row'''
+
+    prices = {}
+    for _, station, _, cents in store.read(zipcode, fuel):
+        prices.setdefault(station, []).append(cents)
+
+    return {station: (min(p), statistics.mean(p), statistics.median(p))
+        for station, p in prices.items()}
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Times price history analytics on generated data'
+    )
+    parser.add_argument('--stations', type=int, default=300)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--per-day', type=int, default=4,
+        help='checks of every station per day')
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp()
+    zipcode = '85364'
+
+    try:
+        store = PriceStore(folder, batch_size=100000)
+        started = perf_counter()
+        rows = generate(store, zipcode, args.stations, args.days, args.per_day)
+        print('{} rows, {} stations, {} days generated in {:.1f}s'.format(
+            rows, args.stations, args.days, perf_counter() - started))
+
+        timed('csv baseline station stats',
+            lambda: python_station_stats(store, zipcode, 'regular'))
+
+        timed('build array cache', lambda: PriceArrays.load(store, zipcode))
+        prices = timed('mmap cached arrays', lambda: PriceArrays.load(store, zipcode))
+
+        timed('zip stats', lambda: prices.zip_stats('regular'))
+        timed('station stats', lambda: prices.station_stats('regular'))
+        timed('station stats, last 30 days', lambda: prices.station_stats(
+            'regular', start=int(time()) - 30 * DAY))
+        timed('7 day rolling means', lambda: prices.rolling_mean('regular'))
+        timed('daily means', lambda: prices.daily_mean('regular'))
+    finally:
+        shutil.rmtree(folder)
+
+if __name__ == '__main__':
+    main()
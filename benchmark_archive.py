@@ -0,0 +1,87 @@
+# Python 3.7.1 - benchmark of re-parsing the raw capture archive
+
+import argparse
+import os
+import random
+import shutil
+import tempfile
+from time import perf_counter, time
+
+from archive import CaptureArchive, reparse
+from pricestore import PriceStore
+from records import FUELS
+
+DAY = 24 * 3600
+
+def prices_text(cents, rng):
+    '''A prices container text like prices_sample.txt, grades shuffled at times'''
+
+    grades = list(zip(FUELS, cents))
+    if rng.random() < 0.05: # a reordered sidebar
+        rng.shuffle(grades)
+
+    return '\n'.join(line for fuel, c in grades
+        for line in (fuel.capitalize(), '${}.{:02d}'.format(*divmod(c, 100))))
+
+def generate(archive, stations, days, per_day, seed=0):
+    """
+    Archives days of captures of stations, per_day captures a day.
+
+    Returns:
+        int: captures archived
+    """
+
+    rng = random.Random(seed)
+    start = int(time()) - days * DAY
+    names = ['Station {} {} Main St, Yuma, AZ {}'.format(
+        i, 100 + i, 85364 + i % 5) for i in range(stations)]
+
+    for check in range(days * per_day):
+        timestamp = start + check * DAY // per_day
+
+        for i, name in enumerate(names):
+            reg = rng.randint(250, 400)
+            url = 'https://www.google.com/maps/place/Station/@32.69,-114.62,17z'
+            archive.add(name[-5:], name, prices_text(
+                (reg + 60, reg, reg + 40, reg + 70), rng), url, timestamp)
+
+    archive.flush()
+    return days * per_day * stations
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Times archive.reparse() on generated captures'
+    )
+    parser.add_argument('--stations', type=int, default=200)
+    parser.add_argument('--days', type=int, default=60)
+    parser.add_argument('--per-day', type=int, default=4,
+        help='captures of every station per day')
+    parser.add_argument('--processes', type=int, nargs='*',
+        default=[1, os.cpu_count()])
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp()
+
+    try:
+        archive = CaptureArchive(os.path.join(folder, '_archive'), 100000)
+        captures = generate(archive, args.stations, args.days, args.per_day)
+        size = sum(os.path.getsize(path) for path in archive.files())
+        print('{} captures over {} days archived, {:.1f} MB compressed'.format(
+            captures, args.days, size / 1e6))
+
+        for processes in args.processes:
+            store_fp = os.path.join(folder, 'store_{}'.format(processes))
+            started = perf_counter()
+            reparse(archive, store_fp, processes=processes)
+            elapsed = perf_counter() - started
+            print('{} processes: {:.2f}s, {:.0f} captures/sec'.format(
+                processes, elapsed, captures / elapsed))
+
+        store = PriceStore(store_fp)
+        rows = sum(1 for zipcode in store.zipcodes() for _ in store.read(zipcode))
+        print(rows, 'rows in the rebuilt store')
+    finally:
+        shutil.rmtree(folder)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+# Python 3.7.1 - startup time of the command line subcommands
+
+import argparse
+import os
+import subprocess
+import sys
+from time import perf_counter
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# (name, python arguments) timed; --help returns right after the imports and
+# argument parsing, so no browser, network or price data is needed
+STARTUPS = [
+    ('python', ['-c', 'pass']),
+    ('main.py --help', ['main.py', '--help']),
+    ('main.py export', ['main.py', '--fp', os.devnull, 'export']),
+    ('main.py query', ['main.py', '--fp', os.devnull, 'query']),
+    ('import helpfuncs', ['-c', 'import helpfuncs']), # the selenium stack
+]
+
+def startup_ms(args, runs):
+    '''Returns the fastest wall clock time of runs runs of python args, in ms'''
+
+    times = []
+
+    for _ in range(runs):
+        started = perf_counter()
+        subprocess.run([sys.executable] + args, cwd=HERE, check=True,
+            stdout=subprocess.DEVNULL)
+        times.append(1000 * (perf_counter() - started))
+
+    return min(times)
+
+def imports_selenium(argv):
+    '''True if main.main(argv) imports selenium'''
+
+    code = ('import sys, main; main.main({!r}); '
+        'print("selenium" in sys.modules)').format(argv)
+    result = subprocess.run([sys.executable, '-c', code], cwd=HERE,
+        check=True, stdout=subprocess.PIPE, universal_newlines=True)
+
+    return result.stdout.split()[-1] == 'True'
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Times the startup of main.py and checks that export and '
+        'query do not import selenium; exits 1 if they are over budget'
+    )
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget', type=float, default=100,
+        help='ms export and query may take over a bare python')
+    args = parser.parse_args()
+
+    results = {}
+    for name, argv in STARTUPS:
+        results[name] = startup_ms(argv, args.runs)
+        print('{:<18} {:>7.1f} ms'.format(name, results[name]))
+
+    failed = []
+
+    for command in ('export', 'query'):
+        if results['main.py ' + command] - results['python'] > args.budget:
+            failed.append(command + ' is over budget')
+        if imports_selenium(['--fp', os.devnull, command]):
+            failed.append(command + ' imports selenium')
+
+    for failure in failed:
+        print(failure)
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
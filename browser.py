@@ -0,0 +1,289 @@
+# Python 3.7.1 - lean chrome profile for scraping the maps sidebar
+
+from time import perf_counter
+import threading
+
+from selenium import webdriver # selenium v3.141.0
+from selenium.common.exceptions import WebDriverException
+
+try:
+    import psutil # optional, for memory per session
+except ImportError:
+    psutil = None
+
+# requests the sidebar never needs: map tiles, images and fonts
+BLOCKED_URLS = [
+    '*/maps/vt*', '*/vt/pb=*', '*/kh/v=*', '*/maps/api/js/StaticMapService*',
+    '*.png*', '*.jpg*', '*.jpeg*', '*.gif*', '*.webp*', '*.svg*', '*.ico*',
+    '*.woff*', '*.ttf*', '*.otf*', '*fonts.gstatic.com*',
+    '*googleusercontent.com*', '*ggpht.com*',
+]
+
+# bytes and requests since the last call, see page_stats()
+PAGE_STATS_JS = '''// gasscraper:page_stats
+var res = performance.getEntriesByType('resource');
+var bytes = 0;
+for (var i = 0; i < res.length; i++) { bytes += res[i].transferSize || 0; }
+var nav = performance.getEntriesByType('navigation')[0];
+if (nav && !window.__gasscraper_nav) {
+    bytes += nav.transferSize || 0;
+    window.__gasscraper_nav = true;
+}
+performance.clearResourceTimings();
+return {bytes: bytes, requests: res.length};
+'''
+
+class BrowserProfile:
+    """
+    Chrome settings for scraping: by default headless, with images, map tiles
+    and fonts blocked and a small fixed window.
+
+    Args:
+        headless (bool, optional): run chrome without a window.
+        block_resources (bool, optional): block images, tiles and fonts.
+        window (tuple, optional): fixed window size.
+        user_data_dir (str, optional): persistent profile folder so the http
+            cache stays warm between runs.
+        measure (bool, optional): record bytes and load time of every page.
+        driver_fp (str, optional): chromedriver path.
+    """
+
+    def __init__(self, headless=True, block_resources=True, window=(800,600),
+        user_data_dir=None, measure=False,
+        driver_fp=r'chromedriver_win32/chromedriver_v79.exe'):
+        self.headless = headless
+        self.block_resources = block_resources
+        self.window = window
+        self.user_data_dir = user_data_dir
+        self.measure = measure
+        self.driver_fp = driver_fp
+
+    def options(self):
+        '''Returns the ChromeOptions for this profile'''
+
+        options = webdriver.ChromeOptions()
+        options.add_argument('--window-size={},{}'.format(*self.window))
+        options.add_argument('--disable-extensions')
+        options.add_argument('--mute-audio')
+
+        if self.headless:
+            options.add_argument('--headless')
+            options.add_argument('--disable-gpu')
+
+        if self.block_resources:
+            options.add_argument('--blink-settings=imagesEnabled=false')
+            options.add_experimental_option('prefs', {
+                'profile.managed_default_content_settings.images': 2,
+            })
+
+        if self.user_data_dir is not None:
+            options.add_argument('--user-data-dir=' + self.user_data_dir)
+
+        return options
+
+    def start(self):
+        '''Driver factory: starts a chrome with this profile'''
+
+        driver = webdriver.Chrome(self.driver_fp, options=self.options())
+
+        if self.block_resources: # block tiles and fonts at the network level
+            driver.execute_cdp_cmd('Network.enable', {})
+            driver.execute_cdp_cmd(
+                'Network.setBlockedURLs', {'urls': BLOCKED_URLS}
+            )
+
+        return driver
+
+def page_stats(driver, started):
+    """
+    Returns the bytes, requests and seconds a page took to load.
+
+    Args:
+        driver (WebDriver): driver that just finished loading a page.
+        started (float): perf_counter() from before the page was requested.
+
+    Returns:
+        dict: {bytes, requests, seconds}
+    """
+
+    stats = dict(driver.execute_script(PAGE_STATS_JS))
+    stats['seconds'] = perf_counter() - started
+
+    return stats
+
+def print_page_stats(stats):
+    '''Prints the average bytes and load time of the pages in stats'''
+
+    if not stats:
+        return
+
+    n = len(stats)
+    print("Pages: " + str(n),
+        "Avg KB: " + str(round(sum(s['bytes'] for s in stats) / n / 1024, 1)),
+        "Avg requests: " + str(round(sum(s['requests'] for s in stats) / n, 1)),
+        "Avg load s: " + str(round(sum(s['seconds'] for s in stats) / n, 3)),
+        sep='\n')
+
+def driver_rss_mb(driver):
+    """
+    Returns the resident memory in MB of a driver's chromedriver and browser
+    processes, or None if psutil is not installed or the pid is unknown.
+    """
+
+    if psutil is None:
+        return None
+
+    try:
+        process = psutil.Process(driver.service.process.pid)
+        processes = [process] + process.children(recursive=True)
+        return sum(p.memory_info().rss for p in processes) / 2**20
+    except (AttributeError, psutil.Error):
+        return None
+
+class SessionManager:
+    """
+    Keeps driver sessions warm between stations, zip codes and tours instead
+    of starting a new browser every time.
+
+    acquire() hands out an idle driver, or starts one if none is idle, and
+    release() takes it back. A driver that has loaded max_pages pages or
+    grown past max_rss_mb is quit on release so the next acquire() starts a
+    fresh one. Drivers idle for more than check_after seconds are checked to
+    still respond before they are handed out again.
+
+    Args:
+        driver_factory (callable, optional): starts a ready to use driver
+            when acquire() is not given one.
+        max_pages (int, optional): pages a session loads before recycling.
+        max_rss_mb (float, optional): memory a session may grow to before
+            recycling; needs psutil.
+        check_after (float, optional): idle seconds before a health check.
+    """
+
+    def __init__(self, driver_factory=None, max_pages=500, max_rss_mb=None,
+        check_after=30):
+        self.driver_factory = driver_factory
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb
+        self.check_after = check_after
+        self.lock = threading.Lock() # shared by pool threads
+        self.idle = [] # (released at, driver), most recent last
+        self.pages = {} # driver: pages loaded so far
+        self.startup_times = [] # seconds to start each session
+        self.session_pages = [] # pages loaded by each retired session
+        self.session_rss = [] # MB of each retired session, with psutil
+        self.recycled = 0
+        self.unhealthy = 0
+
+    def __len__(self):
+        return len(self.pages)
+
+    def healthy(self, driver):
+        '''True if the driver still answers WebDriver commands'''
+
+        try:
+            driver.current_url
+            return True
+        except WebDriverException:
+            return False
+
+    def acquire(self, start=None):
+        """
+        Returns a warm driver, or a new one if none is idle.
+
+        Args:
+            start (callable, optional): starts a new driver. Defaults to
+                self.driver_factory.
+        """
+
+        while True:
+            with self.lock:
+                if not self.idle:
+                    break
+                released, driver = self.idle.pop()
+
+            if perf_counter() - released < self.check_after \
+                or self.healthy(driver):
+                return driver
+
+            self.unhealthy += 1
+            self.retire(driver)
+
+        started = perf_counter()
+        driver = (start or self.driver_factory)()
+
+        with self.lock:
+            self.startup_times.append(perf_counter() - started)
+            self.pages[driver] = 0
+
+        return driver
+
+    def release(self, driver, pages=1, broken=False):
+        """
+        Takes back a driver from acquire().
+
+        Args:
+            driver (WebDriver): driver to give back.
+            pages (int, optional): pages it loaded since acquire().
+            broken (bool, optional): quit it instead of reusing it, e.g. after
+                a WebDriverException or a timed out scrape still using it.
+        """
+
+        with self.lock:
+            self.pages[driver] = self.pages.get(driver, 0) + pages
+            worn_out = self.pages[driver] >= self.max_pages
+
+        if not (broken or worn_out) and self.max_rss_mb is not None:
+            rss = driver_rss_mb(driver)
+            worn_out = rss is not None and rss > self.max_rss_mb
+
+        if broken or worn_out:
+            self.recycled += worn_out
+            self.retire(driver)
+        else:
+            with self.lock:
+                self.idle.append((perf_counter(), driver))
+
+    def retire(self, driver):
+        '''Quits a driver and records its stats'''
+
+        rss = driver_rss_mb(driver)
+
+        with self.lock:
+            self.session_pages.append(self.pages.pop(driver, 0))
+            if rss is not None:
+                self.session_rss.append(rss)
+
+        try:
+            driver.quit()
+        except WebDriverException:
+            pass # browser is already gone
+
+    def close(self):
+        '''Quits every idle driver'''
+
+        with self.lock:
+            idle, self.idle = self.idle, []
+
+        for _, driver in idle:
+            self.retire(driver)
+
+    def print_stats(self):
+        '''Prints startup time, pages and memory per session'''
+
+        started = len(self.startup_times)
+        if not started:
+            return
+
+        print("Sessions: " + str(started),
+            "Avg startup s: " + str(round(sum(self.startup_times) / started, 3)),
+            "Recycled: " + str(self.recycled),
+            "Unhealthy: " + str(self.unhealthy), sep='\n')
+
+        if self.session_pages:
+            print("Avg pages per session: " + str(round(
+                sum(self.session_pages) / len(self.session_pages), 1)))
+
+        if self.session_rss:
+            print("Avg MB per session: " + str(round(
+                sum(self.session_rss) / len(self.session_rss), 1)))
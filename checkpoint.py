@@ -0,0 +1,166 @@
+# Python 3.7.1 - resumable tours and end-of-tour retries
+
+import heapq
+import os
+import threading
+from time import sleep, time
+
+def read_lines(fp):
+    with open(fp) as text_file:
+        return [line.rstrip('\n') for line in text_file if line.strip()]
+
+class TourCheckpoint:
+    """
+    Append-only log of the stations a tour has finished, one per line, so a
+    tour that crashed can skip them when it is started again.
+
+    Finished stations are only logged by commit(), which first has their
+    prices written out, so a crash never leaves a station logged whose prices
+    were still buffered. Call finish() once the whole tour is done to start
+    the next one fresh.
+
+    Args:
+        fp (str): text file of the log.
+        batch_size (int, optional): finished stations that make complete()
+            ask for a commit().
+    """
+
+    def __init__(self, fp, batch_size=50):
+        self.fp = fp
+        self.batch_size = batch_size
+        self.lock = threading.Lock()
+        self.completed = set()
+        self.pending = [] # finished, not logged yet
+
+        if os.path.isfile(fp):
+            self.completed.update(read_lines(fp))
+
+        self.log = None
+
+    def __contains__(self, station):
+        return station in self.completed
+
+    def __len__(self):
+        return len(self.completed)
+
+    def complete(self, station):
+        """
+        Marks a station finished; it is logged by the next commit().
+
+        Returns:
+            bool: True once batch_size stations wait for a commit()
+        """
+
+        with self.lock:
+            self.completed.add(station)
+            self.pending.append(station)
+            return len(self.pending) >= self.batch_size
+
+    def commit(self, flush=None):
+        """
+        Logs the stations finished so far.
+
+        Args:
+            flush (callable, optional): writes out their prices. It is called
+                after the stations are taken, so it also writes the prices of
+                any station finished in the meantime.
+        """
+
+        with self.lock:
+            stations, self.pending = self.pending, []
+
+        if flush is not None:
+            flush()
+
+        if not stations:
+            return
+
+        with self.lock:
+            if self.log is None:
+                self.log = open(self.fp, 'a')
+
+            self.log.write(''.join(station + '\n' for station in stations))
+            self.log.flush()
+
+    def finish(self):
+        '''Deletes the log after a tour ran to the end'''
+
+        with self.lock:
+            if self.log is not None:
+                self.log.close()
+                self.log = None
+
+            self.completed.clear()
+            self.pending = []
+            if os.path.isfile(self.fp):
+                os.remove(self.fp)
+
+class RetryQueue:
+    """
+    Stations that failed during a tour, retried after the rest of the tour
+    with exponential backoff: attempt n waits base_delay * 2 ** (n - 1)
+    seconds (at most max_delay) after the failure.
+
+    Args:
+        attempts (int, optional): tries per station, including the first.
+        base_delay (float, optional): seconds before the first retry.
+        max_delay (float, optional): longest wait before a retry.
+    """
+
+    def __init__(self, attempts=3, base_delay=2, max_delay=60):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.lock = threading.Lock()
+        self.heap = [] # (ready at, seq, station)
+        self.tries = {} # station: failed attempts so far
+        self.given_up = []
+        self.seq = 0
+
+    def __len__(self):
+        return len(self.heap)
+
+    def failed(self, station):
+        """
+        Queues a failed station for a later retry.
+
+        Returns:
+            bool: False if the station ran out of attempts
+        """
+
+        with self.lock:
+            tries = self.tries.get(station, 0) + 1
+            self.tries[station] = tries
+
+            if tries >= self.attempts:
+                self.given_up.append(station)
+                return False
+
+            delay = min(self.max_delay, self.base_delay * 2 ** (tries - 1))
+            heapq.heappush(self.heap, (time() + delay, self.seq, station))
+            self.seq += 1
+            return True
+
+    def next_round(self):
+        """
+        Waits until the first queued station is ready and returns every
+        station that is ready by then.
+
+        Returns:
+            lst: stations to retry, empty when the queue is empty
+        """
+
+        with self.lock:
+            if not self.heap:
+                return []
+            wait = self.heap[0][0] - time()
+
+        if wait > 0:
+            sleep(wait)
+
+        with self.lock:
+            ready = []
+            now = time()
+            while self.heap and self.heap[0][0] <= now:
+                ready.append(heapq.heappop(self.heap)[2])
+            return ready
@@ -0,0 +1,499 @@
+# Python 3.7.1 - offline stand-in for the selenium Chrome driver
+
+import hashlib
+import json
+import re
+import threading
+from time import perf_counter, sleep
+
+from selenium.common.exceptions import NoSuchElementException
+from selenium.common.exceptions import StaleElementReferenceException
+from selenium.common.exceptions import ElementClickInterceptedException
+from selenium.common.exceptions import WebDriverException
+
+from registry import split_address
+
+MAPS_URL = 'https://www.google.com/maps'
+FUELS = ['diesel', 'regular', 'midgrade', 'premium']
+
+# xpaths the scrapers use that are not plain class name lookups
+SEARCH_FIELD = '//*[@id="searchboxinput"]'
+SEARCH_BUTTON = '//*[@id="searchbox-searchbutton"]'
+NEXT_BUTTON = '//*[@id="n7lv7yjyC35__section-pagination-button-next"]'
+FIRST_RESULT = [
+    '//*[@id="pane"]/div/div[1]/div/div/div[4]/div[1]/div[1]',
+    '//*[@id="pane"]/div/div[1]/div/div/div[2]/div[1]/div[1]',
+]
+
+def norm(text):
+    '''Lower cases text and collapses punctuation and whitespace'''
+
+    return ' '.join(re.sub(r'[,.]', ' ', text.lower()).split())
+
+def _digest(text):
+    '''Returns a stable integer for text, used to fake coordinates and prices'''
+
+    return int(hashlib.md5(text.encode()).hexdigest()[:8], 16)
+
+class FakeStation:
+    '''A gas station as it appears on the fake map'''
+
+    def __init__(self, id, name, street, address, lat, lon, prices=None,
+        ambiguous=False):
+        self.id = id
+        self.name = name
+        self.street = street
+        self.address = address
+        self.lat = lat
+        self.lon = lon
+        self.prices = prices # {fuel: '3.30'} or None if no price info
+        self.ambiguous = ambiguous # search lists it among namesakes
+
+    @property
+    def prices_text(self):
+        '''Text of the 'section-gas-prices-container' element'''
+
+        return '\n'.join(
+            line for fuel in FUELS
+            for line in (fuel.capitalize(), '$' + self.prices[fuel])
+        )
+
+    @property
+    def url(self):
+        '''Place url in the same shape as a real google maps place url'''
+
+        return '{}/place/{}/@{},{},17z/data=!3m1!4b1!4m5!3m4!1s0x0:0x{:x}'\
+            '!8m2!3d{}!4d{}'.format(
+                MAPS_URL, '+'.join((self.name + ' ' + self.street).split()),
+                self.lat, self.lon, self.id, self.lat, self.lon
+            )
+
+    def to_dict(self):
+        return dict(self.__dict__)
+
+class FakeMaps:
+    """
+    The fake google maps 'server' shared by every FakeDriver it creates.
+
+    It knows a list of stations, answers searches the way the maps sidebar
+    does and keeps count of the WebDriver commands and page loads it served.
+
+    Args:
+        stations (lst): FakeStation objects.
+        center (tuple): lat, lon used for area and results page urls.
+        page_size (int): results listed per results page.
+        latency (float): seconds slept on every WebDriver command.
+        load_latency (float): extra seconds slept on every page load.
+    """
+
+    def __init__(self, stations, center=(32.6927, -114.6277), page_size=20,
+        latency=0.0, load_latency=0.0):
+        self.stations = list(stations)
+        self.center = center
+        self.page_size = page_size
+        self.latency = latency
+        self.load_latency = load_latency
+        self.lock = threading.Lock()
+        self.reset_stats()
+
+    @classmethod
+    def from_addresses(cls, addresses, decoys=0, **kwargs):
+        """
+        Builds a map from 'gas_stations.txt' style lines.
+
+        Coordinates and prices are derived from a hash of each line so the
+        same list always makes the same map.
+
+        Args:
+            addresses (lst): {name} {street}, {city}, {state} {zipcode} lines
+            decoys (int, optional): extra stations without price info mixed
+                into the results pages.
+        """
+
+        maps = cls([], **kwargs)
+        lat, lon = maps.center
+
+        for line in dict.fromkeys(addresses): # skip repeated lines
+            h = _digest(line)
+            regular = 250 + h % 80
+            maps.stations.append(FakeStation(
+                len(maps.stations), *split_address(line),
+                lat=round(lat + (h % 2000 - 1000) / 10000, 7),
+                lon=round(lon + (h // 2000 % 2000 - 1000) / 10000, 7),
+                prices={
+                    'diesel': '{:.2f}'.format((regular + 40) / 100),
+                    'regular': '{:.2f}'.format(regular / 100),
+                    'midgrade': '{:.2f}'.format((regular + 30) / 100),
+                    'premium': '{:.2f}'.format((regular + 55) / 100),
+                }
+            ))
+
+        # spread stations without prices thru the list
+        step = max(1, len(maps.stations) // (decoys + 1))
+        for i in range(decoys):
+            station = FakeStation(
+                len(maps.stations), 'Mini Mart', '{} Decoy Rd'.format(100 + i),
+                '{} Decoy Rd, Yuma, AZ 85364'.format(100 + i), lat, lon
+            )
+            maps.stations.insert((i + 1) * step + i, station)
+
+        return maps
+
+    @classmethod
+    def load(cls, fp, **kwargs):
+        '''Loads a map recorded with save()'''
+
+        with open(fp) as fixture:
+            data = json.load(fixture)
+
+        kwargs.setdefault('center', tuple(data.get('center', (0, 0))))
+        return cls([FakeStation(**s) for s in data['stations']], **kwargs)
+
+    def save(self, fp):
+        '''Saves the stations as a json fixture'''
+
+        with open(fp, 'w') as fixture:
+            json.dump(dict(
+                center=self.center,
+                stations=[s.to_dict() for s in self.stations]
+            ), fixture, indent=1)
+
+    def new_driver(self):
+        '''Driver factory: returns a new FakeDriver on this map'''
+
+        return FakeDriver(self)
+
+    def reset_stats(self):
+        '''Zeroes the command counters'''
+
+        with self.lock:
+            self.commands = 0
+            self.page_loads = 0
+            self.step_times = {} # command name: [seconds, ...]
+
+    def roundtrip(self, command, started, load=False):
+        '''Simulates the latency of a WebDriver command and records it'''
+
+        sleep(self.latency + (self.load_latency if load else 0))
+
+        with self.lock:
+            self.commands += 1
+            self.page_loads += load
+            self.step_times.setdefault(command, []).append(
+                perf_counter() - started
+            )
+
+    def results_url(self, query, page=0):
+        lat, lon = self.center
+        url = '{}/search/{}/@{},{},13z/data=!3m1!4b1'.format(
+            MAPS_URL, '+'.join(query.split()), lat, lon
+        )
+        return url + ('!5m1!1e{}'.format(page) if page else '')
+
+    def search(self, query):
+        '''Returns the url the sidebar ends up on after searching query'''
+
+        q = norm(query)
+
+        if re.fullmatch(r'\d{5}', q): # zip code
+            lat, lon = self.center
+            return '{}/place/{}/@{},{},12z/data=!3m1!4b1!4m5'.format(
+                MAPS_URL, q, lat, lon
+            )
+
+        if q in ('gas station', 'gas stations'):
+            return self.results_url(query)
+
+        matches = [s for s in self.stations if q in (
+            norm(s.name + ' ' + s.address), norm(s.name + ' ' + s.street),
+            norm(s.address)
+        )]
+
+        if len(matches) == 1 and not matches[0].ambiguous:
+            return matches[0].url
+
+        return self.results_url(query) # several or no results
+
+    def page(self, url):
+        """
+        Returns what is on the sidebar at url.
+
+        Returns:
+            tuple: ('place', FakeStation), ('results', [FakeStation], more) or
+                ('home', None)
+        """
+
+        for station in self.stations:
+            if url == station.url:
+                return 'place', station
+
+        match = re.match(
+            re.escape(MAPS_URL) + r'/search/([^/]+)/@[^/]+/data=!3m1!4b1'
+            r'(?:!5m1!1e(\d+))?$', url
+        )
+        if not match:
+            return 'home', None
+
+        query = match.group(1).replace('+', ' ')
+        page = int(match.group(2) or 0)
+
+        if norm(query) in ('gas station', 'gas stations'):
+            listed = self.stations
+        else:
+            q = norm(query)
+            listed = [s for s in self.stations if q in (
+                norm(s.name + ' ' + s.address), norm(s.name + ' ' + s.street),
+                norm(s.address)
+            )]
+            # ambiguous searches also list stations with the same name
+            if any(s.ambiguous for s in listed):
+                listed += [s for s in self.stations if s not in listed
+                    and s.name == listed[0].name]
+
+        start = page * self.page_size
+        return (
+            'results', listed[start:start + self.page_size],
+            start + self.page_size < len(listed)
+        )
+
+class FakeElement:
+    '''A WebElement on a FakeDriver page'''
+
+    def __init__(self, driver, class_name, text='', children=(), on_click=None,
+        persistent=False, attrs=None):
+        self.driver = driver
+        self.class_name = class_name
+        self._text = text
+        self.children = list(children)
+        self.on_click = on_click
+        self.persistent = persistent # survives navigation, e.g. the search box
+        self.attrs = attrs or {}
+        self.generation = driver.generation
+
+    def _check(self, command):
+        started = perf_counter()
+        self.driver._check_open()
+        if not self.persistent and self.generation != self.driver.generation:
+            raise StaleElementReferenceException(
+                'element is not attached to the page document'
+            )
+        self.driver.maps.roundtrip(command, started)
+
+    @property
+    def text(self):
+        self._check('text')
+        return self._text
+
+    def get_attribute(self, name):
+        self._check('get_attribute')
+        return self.attrs.get(name)
+
+    def is_displayed(self):
+        self._check('is_displayed')
+        return True
+
+    def is_enabled(self):
+        self._check('is_enabled')
+        return True
+
+    def click(self):
+        self._check('click')
+        if self.on_click is not None:
+            self.on_click()
+
+    def send_keys(self, text):
+        self._check('send_keys')
+        self._text += text
+
+    def clear(self):
+        self._check('clear')
+        self._text = ''
+
+    def walk(self):
+        '''Yields this element and all its children in document order'''
+
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+    def find_elements(self, by='class name', value=None):
+        self._check('find_elements')
+        return [e for c in self.children for e in c.walk()
+            if by == 'class name' and e.class_name == value]
+
+    def find_element(self, by='class name', value=None):
+        found = self.find_elements(by, value)
+        if not found:
+            raise NoSuchElementException(
+                'Unable to locate element: ' + str(value)
+            )
+        return found[0]
+
+    def find_element_by_class_name(self, name):
+        return self.find_element('class name', name)
+
+    def find_elements_by_class_name(self, name):
+        return self.find_elements('class name', name)
+
+class FakeDriver:
+    """
+    Implements the part of the selenium WebDriver API the scrapers use,
+    against a FakeMaps instead of google maps.
+    """
+
+    def __init__(self, maps):
+        self.maps = maps
+        self.generation = 0
+        self.closed = False
+        self.url = MAPS_URL
+        self.search_field = FakeElement(self, 'searchboxinput', persistent=True)
+        self.search_button = FakeElement(
+            self, 'searchbox-searchbutton', persistent=True,
+            on_click=lambda: self._load(maps.search(self.search_field._text))
+        )
+        self._load(MAPS_URL)
+
+    def _check_open(self):
+        if self.closed:
+            raise WebDriverException('chrome not reachable')
+
+    @property
+    def current_url(self):
+        self._command('current_url')
+        return self.url
+
+    def _command(self, command):
+        started = perf_counter()
+        self._check_open()
+        self.maps.roundtrip(command, started)
+
+    def _load(self, url):
+        '''Navigates to url and builds the elements of the new page'''
+
+        started = perf_counter()
+        self.generation += 1
+        self.url = url
+        self.elements = []
+        self.xpaths = {}
+        page = self.maps.page(url)
+
+        if page[0] == 'place':
+            self._place_page(page[1])
+        elif page[0] == 'results':
+            self._results_page(*page[1:])
+
+        self.maps.roundtrip('load', started, load=True)
+
+    def _place_page(self, station):
+        E = FakeElement
+        self.elements.append(E(self, 'section-hero-header-title', station.name))
+        if station.prices:
+            self.elements.append(E(
+                self, 'section-gas-prices-container', station.prices_text
+            ))
+        self.elements.append(E(self, 'section-info-line', station.address))
+
+    def _results_page(self, listed, more):
+        E = FakeElement
+        match = re.search(r'!5m1!1e(\d+)$', self.url)
+        page = int(match.group(1)) if match else 0
+
+        for station in listed:
+            children = [
+                E(self, 'section-result-title', station.name),
+                E(self, 'section-result-location', station.street),
+            ]
+            if station.prices:
+                children.append(E(
+                    self, 'section-result-annotation',
+                    '$' + station.prices['regular']
+                ))
+            self.elements.append(E(
+                self, 'section-result', children=children,
+                attrs={'href': station.url},
+                on_click=lambda url=station.url: self._load(url)
+            ))
+
+        for xpath in FIRST_RESULT:
+            if self.elements:
+                self.xpaths[xpath] = self.elements[0]
+
+        def next_page():
+            if not more:
+                raise ElementClickInterceptedException(
+                    'element click intercepted'
+                )
+            base = re.sub(r'!5m1!1e\d+$', '', self.url)
+            self._load(base + '!5m1!1e{}'.format(page + 1))
+
+        self.xpaths[NEXT_BUTTON] = E(self, 'next', on_click=next_page)
+
+    def get(self, url):
+        self._check_open()
+        self._load(url)
+
+    def maximize_window(self):
+        self._command('maximize_window')
+
+    def set_window_size(self, width, height):
+        self._command('set_window_size')
+
+    def quit(self):
+        self.closed = True
+
+    def execute_script(self, script, *args):
+        """
+        Runs one of the scraper's scripts, picked by the '// gasscraper:{name}'
+        tag on its first line, against the fake page.
+        """
+
+        self._command('execute_script')
+        name = script.split('\n', 1)[0].replace('// gasscraper:', '').strip()
+        return getattr(self, '_script_' + name)(*args)
+
+    def _script_results(self):
+        rows = []
+        for row in self.elements:
+            if row.class_name != 'section-result':
+                continue
+            fields = {c.class_name: c._text for c in row.children}
+            rows.append(dict(
+                name=fields.get('section-result-title'),
+                street=fields.get('section-result-location'),
+                has_prices='section-result-annotation' in fields,
+                link=row.attrs.get('href')
+            ))
+        return rows
+
+    def _script_page_stats(self):
+        return dict(bytes=0, requests=0) # the fake map has no network
+
+    def find_elements(self, by='class name', value=None):
+        self._command('find_elements')
+
+        if by == 'xpath':
+            if value == SEARCH_FIELD:
+                return [self.search_field]
+            if value == SEARCH_BUTTON:
+                return [self.search_button]
+            return [self.xpaths[value]] if value in self.xpaths else []
+
+        return [e for element in self.elements for e in element.walk()
+            if by == 'class name' and e.class_name == value]
+
+    def find_element(self, by='class name', value=None):
+        found = self.find_elements(by, value)
+        if not found:
+            raise NoSuchElementException(
+                'Unable to locate element: ' + str(value)
+            )
+        return found[0]
+
+    def find_element_by_xpath(self, xpath):
+        return self.find_element('xpath', xpath)
+
+    def find_element_by_class_name(self, name):
+        return self.find_element('class name', name)
+
+    def find_elements_by_class_name(self, name):
+        return self.find_elements('class name', name)
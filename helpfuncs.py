@@ -4,7 +4,6 @@ from selenium import webdriver # selenium v3.141.0
 
 # for 'explicit' wait implementation
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
 # Selenium exception handling
@@ -12,11 +11,26 @@ from selenium.common.exceptions import NoSuchElementException
 from selenium.common.exceptions import TimeoutException
 from selenium.common.exceptions import StaleElementReferenceException
 from selenium.common.exceptions import ElementClickInterceptedException
-
-from datetime import datetime
-from time import ctime, sleep
+from selenium.common.exceptions import WebDriverException
+
+from collections import deque
+import asyncio
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor
+from concurrent.futures import wait as wait_futures
+from itertools import islice
+from time import perf_counter, time
 import os
 import csv
+import re
+
+from browser import SessionManager, page_stats, print_page_stats
+from checkpoint import RetryQueue
+from metrics import NULL_METRICS
+from normalize import AddressIndex
+from pipeline import Pipeline
+from records import GasStation, GeoInfo, format_cents, parse_fixed
+from registry import StationRegistry, split_address
+from waits import Waits, results_replaced, url_changed
 
 def read_addresses(txt_file_path) -> []:
     '''Returns a text file of addresses as a python list'''
@@ -24,47 +38,55 @@ def read_addresses(txt_file_path) -> []:
     addresses = open(txt_file_path) # file should have an address per line
     return [line.strip('\n') for line in addresses] # returns addresses as list
 
+def address_zip(address):
+    '''Returns the zip code at the end of an address, or 'unknown' '''
+
+    match = re.search(r'(\d{5})\s*$', address)
+    return match.group(1) if match else 'unknown'
+
 def get_latlong(url):
     '''Returns dict of latitude & longitude from a location in google maps'''
 
     x, y = url.split('/@')[1].split('/data=!')[0].split(',')[:2]
     return GeoInfo(x, y)
 
+def start_driver(driver_factory=None,
+    driver_fp=r'chromedriver_win32/chromedriver_v79.exe'):
+    """
+    Starts a new webdriver session.
+
+    Args:
+        driver_factory (callable, optional): returns a new driver when called
+            with no arguments, e.g. fakedriver.FakeMaps.new_driver. Defaults
+            to a local Chrome.
+        driver_fp (str, optional): chromedriver path used by the default.
+    """
+
+    if driver_factory is None:
+        return webdriver.Chrome(driver_fp)
+
+    return driver_factory()
+
 def make_nested_folders(path):
     """
-    Creates all of the non-existent directories in a relative path from cwd.
+    Creates all of the non-existent directories in a path.
 
     If any directories already exist they are skipped and not overwritten.
     
     Args:
-        path (str): relative file path of non-existent subfolders folders.
+        path (str): relative or absolute path of the folders.
     """
 
     # check for minimal length and str type
-    if len(path) < 0 or not isinstance(path, str):
+    if not isinstance(path, str) or len(path) < 1:
         print("path needs to be a string of character length 1 or longer.")
         return
 
-    dir_path = os.path.normpath(path) # normalize path
-    folder_list = dir_path.split(os.sep) # create list of folders in nested order
-    path_string = ''
-
-    for folder in folder_list:
-
-        # update path and normalize
-        if len(path_string) is 0:
-            path_string += folder
-        else: # if not first directory in path_string add separator
-            path_string += "\\" + folder
-
-        path_string = os.path.normpath(path_string)
-
-        if os.path.isdir(path_string): # does the directory exist
-            print(path_string, 'already exists.')
-            pass
-        else:
-            os.mkdir(path_string) # if not create it
-            print(path_string, "created.")
+    if os.path.isdir(path): # does the directory exist
+        print(path, 'already exists.')
+    else:
+        os.makedirs(path, exist_ok=True) # if not create it and its parents
+        print(path, "created.")
 
 def create_csv(file_path, name):
     """
@@ -111,7 +133,103 @@ def make_file_structure(zipcode, fp='fuel_prices'):
     # if it exists it will not be modified
     open(os.path.join(path, "_gas_stations_"+zipcode+".txt"), 'a').close()
 
-def populate_gas_stations(stations=20, fp='fuel_prices'):
+def zipcode_folders(fp='fuel_prices'):
+    '''Returns the 5-digit zip code folder names inside fp, sorted'''
+
+    if not os.path.isdir(fp):
+        return []
+
+    return sorted(name for name in os.listdir(fp)
+        if re.fullmatch(r'\d{5}', name) and os.path.isdir(os.path.join(fp, name)))
+
+def gas_station_line(name, address):
+    """
+    Formats a '_gas_stations_{zipcode}.txt' line, which
+    registry.split_address() reads back:
+
+        >>> line = gas_station_line('Chevron', '1825 S 4th Ave, Yuma, AZ 85364')
+        >>> split_address(line)[:2]
+        ('Chevron', '1825 S 4th Ave')
+    """
+
+    return name + ', ' + address
+
+def write_gas_stations(txt_fp, stations):
+    """
+    Replaces the contents of a '_gas_stations_{zipcode}.txt' file.
+
+    The lines are written to a temp file that is then renamed over txt_fp,
+    so readers never see a half written list.
+
+    Args:
+        txt_fp (str): path of the text file.
+        stations (lst): GasStation objects with name and address.
+    """
+
+    with open(txt_fp + '.tmp', 'w') as txt_file:
+        for gs in stations:
+            txt_file.write(gas_station_line(gs.name, gs.address) + '\n')
+
+    os.replace(txt_fp + '.tmp', txt_fp)
+
+async def populate_zipcode(zipcode, stations, fp, timeout, semaphore, executor,
+    **scraper_kwargs):
+    """
+    Scrapes the gas stations of one zip code on a worker thread and writes
+    them to its '_gas_stations_{zipcode}.txt' file.
+
+    Returns:
+        tuple: (zipcode, stations found or None if it failed, seconds)
+    """
+
+    async with semaphore:
+        txt_fp = os.path.join(fp, zipcode, '_gas_stations_' + zipcode + '.txt')
+        gss = GasStationScraper(txt_fp, zipcode, stations, **scraper_kwargs)
+        loop = asyncio.get_running_loop()
+        started = perf_counter()
+        found = None
+
+        try:
+            found = await asyncio.wait_for(
+                loop.run_in_executor(executor, gss.scrape), timeout
+            )
+        except asyncio.TimeoutError:
+            print(zipcode, "timed out after", timeout, "seconds.")
+        except WebDriverException as e:
+            print(zipcode, "WebDriverException:", e.msg)
+        except Exception as e: # must not cancel the other zip codes
+            print(zipcode, "failed:", repr(e))
+        finally:
+            gss.close(broken=found is None) # also stops a timed out scrape
+
+        if found is not None:
+            try:
+                write_gas_stations(txt_fp, found)
+            except OSError as e:
+                print(zipcode, "could not be written:", repr(e))
+                found = None
+
+        elapsed = perf_counter() - started
+        print(zipcode, "stations:", None if found is None else len(found),
+            "seconds:", round(elapsed, 2))
+
+        return zipcode, None if found is None else len(found), elapsed
+
+async def populate_zipcodes(zipcodes, stations=20, fp='fuel_prices',
+    concurrency=4, timeout=300, **scraper_kwargs):
+    '''Runs populate_zipcode() for zipcodes, concurrency at a time'''
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    with ThreadPoolExecutor(concurrency) as executor:
+        return await asyncio.gather(*(
+            populate_zipcode(zipcode, stations, fp, timeout, semaphore,
+                executor, **scraper_kwargs)
+            for zipcode in zipcodes
+        ))
+
+def populate_gas_stations(stations=20, fp='fuel_prices', concurrency=4,
+    timeout=300, **scraper_kwargs):
     """
     Populates '_gas_stations_{zipcode}.txt' files in each zipcode folder inside
     the root fp directory; dfault named 'fuel_prices'
@@ -120,35 +238,104 @@ def populate_gas_stations(stations=20, fp='fuel_prices'):
 
     Gas stations addresses are saved in the following convention: 
     {name}, {address}, {city}, {state} {zipcode}
+
+    Zip codes are scraped concurrently on their own drivers, at most
+    concurrency at a time, and a zip code that takes longer than timeout
+    seconds is abandoned and keeps its previous text file.
     
     Args:
         stations (int, optional): number of stations wanted. Defaults to 20.
         fp (str, optional): directory of where zipcode folders are populated
+        concurrency (int, optional): zip codes scraped at the same time.
+        timeout (int, optional): seconds allowed per zip code.
+        **scraper_kwargs: passed on to GasStationScraper, e.g. profile.
+            Defaults to a registry saved in '{fp}/_stations.json' and a
+            SessionManager that keeps browsers warm between zip codes and
+            one Waits whose timeouts they all learn.
+
+    Returns:
+        lst: (zipcode, stations found or None if it failed, seconds) tuples
+    """
+
+    # one registry for all zip codes so shared stations are scraped once
+    registry = scraper_kwargs.setdefault(
+        'registry', StationRegistry(os.path.join(fp, '_stations.json'))
+    )
+    registry.start_tour()
+
+    # browsers are handed from one zip code to the next instead of restarted
+    own_sessions = 'sessions' not in scraper_kwargs
+    sessions = scraper_kwargs.setdefault('sessions', SessionManager())
+    scraper_kwargs.setdefault('waits', Waits()) # timeouts learned across zips
+
+    started = perf_counter()
+    try:
+        report = asyncio.run(populate_zipcodes(
+            zipcode_folders(fp), stations, fp, concurrency, timeout,
+            **scraper_kwargs
+        ))
+    finally:
+        if own_sessions:
+            sessions.close()
+        registry.save() # what the zip codes found so far
+        if scraper_kwargs.get('place_cache') is not None:
+            scraper_kwargs['place_cache'].save()
+    sessions.print_stats()
+
+    print("Zip codes:", len(report),
+        "failed:", sum(found is None for _, found, _ in report),
+        "seconds:", round(perf_counter() - started, 2))
+
+    return report
+
+# reads every search result row in one round trip, see extract_results()
+RESULTS_JS = '''// gasscraper:results
+return Array.prototype.map.call(
+    document.getElementsByClassName('section-result'), function (row) {
+        function text(name) {
+            var el = row.getElementsByClassName(name)[0];
+            return el ? el.innerText : null;
+        }
+        var link = row.closest('a[href]') || row.querySelector('a[href]');
+        return {
+            name: text('section-result-title'),
+            street: text('section-result-location'),
+            has_prices: row.getElementsByClassName(
+                'section-result-annotation').length > 0,
+            link: row.getAttribute('href') || (link ? link.href : null)
+        };
+    });
+'''
+
+def pick_result(rows, name, address):
     """
+    Finds the results row of a station among the namesakes a search listed,
+    by matching every row at once with a normalize.AddressIndex.
 
-    # TODO: iterate through 'fuel_prices' or equivalent, zipcode folders
-    #       get all the _gas_stations_{'zipcode'}.txt file paths
-    # TODO: scrape per zipcode
-    # TODO: write results to each zipcode's gas station txt file
-    pass
+    Args:
+        rows (lst): rows read with RESULTS_JS.
+        name (str): business name that was searched.
+        address (str): street or full address that was searched.
+
+    Returns:
+        int: index of the matching row, None if no row is the station
+    """
 
-class GeoInfo:
-    '''Stores geographical data about a location visisted on google maps'''
+    index = AddressIndex()
 
-    def __init__(self, x, y):
-        self.lat = float(x)
-        self.lon = float(y)
+    for i, row in enumerate(rows):
+        if row['name'] and row['street']:
+            index.add(i, row['name'], row['street'])
 
-class GasPrices:
-    '''Stores fuel prices as scraped from google maps'''
+    return index.match(name, address)[0]
 
-    def __init__(self, diesel, reg, mid, premium):
-        self.diesel = diesel
-        self.regular = reg
-        self.midgrade = mid
-        self.premium = premium
-        # timestamp will be in local time
-        self.timestamp = ctime(datetime.now().timestamp())
+def open_result(driver, rows, i):
+    '''Opens the place page of the i-th results row'''
+
+    if rows[i]['link'] is not None:
+        driver.get(rows[i]['link'])
+    else:
+        driver.find_elements_by_class_name('section-result')[i].click()
 
 class GasPriceChecker:
     '''Uses the selenium driver to visit a list of gas station addresses'''
@@ -158,96 +345,557 @@ class GasPriceChecker:
         searchButton = '//*[@id="searchbox-searchbutton"]'
     )
 
-    def __init__(self, url, xpaths, addresses_txt_file_path):
+    def __init__(self, url, xpaths, addresses_txt_file_path,
+        driver_factory=None, place_cache=None, profile=None, store=None,
+        registry=None, history=None, checkpoint=None, retry_attempts=3,
+        sessions=None, metrics=None, waits=None, latest=None, writers=0,
+        queue_size=256, archive=None):
         self.url = url
         self.xpaths = xpaths # xpath dictionary
         self.locations = read_addresses(addresses_txt_file_path)
         self.driver_fp = r'chromedriver_win32/chromedriver_v79.exe'
-
-    def parse_prices(self, string):
+        self.profile = profile # browser.BrowserProfile or None
+        if driver_factory is None and profile is not None:
+            driver_factory = profile.start
+        self.driver_factory = driver_factory # None for a local Chrome
+        self.place_cache = place_cache # placecache.PlaceCache or None
+        self.page_stats = [] # filled when profile.measure is True
+        self.store = store # pricestore.PriceStore or None
+        self.history = history # pricestore.PriceHistory or None
+        self.checkpoint = checkpoint # checkpoint.TourCheckpoint or None
+        self.retry_attempts = retry_attempts # tries per station and tour
+        # dedups self.locations; in memory unless a registry is passed
+        self.registry = registry if registry is not None else StationRegistry(None)
+        # warm drivers; one of our own is closed at the end of every tour
+        self.own_sessions = sessions is None
+        self.sessions = sessions if sessions is not None else SessionManager()
+        # metrics.Metrics, exported at the end of every tour; off by default
+        self.metrics = metrics if metrics is not None else NULL_METRICS
+        self.waits = waits if waits is not None else Waits() # learned timeouts
+        self.latest = latest # latest.LatestPrices served over http, or None
+        # threads that parse and persist tours behind a bounded queue of
+        # captured sidebars, see iter_check(); 0 to do it on the browser ones
+        self.writers = writers
+        self.queue_size = queue_size
+        self.pipeline = None # of the last tour with writers
+        self.archive = archive # archive.CaptureArchive of raw captures or None
+
+    def parse_prices(self, string, timestamp=None):
         '''Parses thru prices string and returns a GasPrices instance'''
 
-        return GasPrices(
-            *[i.strip('$') for i in string.split() if '$' in i or '-' in i]
+        return parse_fixed(string, timestamp)
+
+    def open_driver(self, max_window=True, dims=(1080,800)):
+        '''Opens a webdriver, sets its window size and goes to self.url'''
+
+        with self.metrics.stage('driver_start'):
+            driver = start_driver(self.driver_factory, self.driver_fp)
+
+        # set window size and go to url
+        if self.profile is not None:
+            driver.set_window_size(*self.profile.window)
+        elif max_window:
+            driver.maximize_window()
+        else:
+            driver.set_window_size(*dims)
+
+        driver.get(self.url)
+
+        return driver
+
+    def session_visit(self, loc, max_window=True, dims=(1080,800), raw=False):
+        """
+        try_visit() on a driver borrowed from self.sessions. A driver that
+        raised anything is quit instead of handed back, and the error raised.
+        """
+
+        driver = self.sessions.acquire(lambda: self.open_driver(max_window, dims))
+
+        try:
+            result = self.try_visit(driver, loc, raw)
+        except BaseException: # never leak the driver, whatever went wrong
+            self.sessions.release(driver, broken=True)
+            raise
+
+        self.sessions.release(driver)
+        return result
+
+    def visit(self, driver, loc):
+        """
+        Searches for a single gas station address and scrapes its sidebar.
+
+        Args:
+            driver (WebDriver): driver already pointed at self.url
+            loc (str): gas station address to search for
+
+        Returns:
+            tuple: (GasPrices, GeoInfo) for the station
+
+        Raises:
+            see capture()
+        """
+
+        return self.parse_capture(loc, *self.capture(driver, loc))
+
+    def capture(self, driver, loc):
+        """
+        The browser half of visit(): searches for a single gas station
+        address and reads its sidebar, without parsing it.
+
+        If the address is in self.place_cache the driver goes straight to its
+        place url instead of searching for it. When the search lists several
+        results, the one matching loc is opened, see pick_result().
+
+        Args:
+            driver (WebDriver): driver already pointed at self.url
+            loc (str): gas station address to search for
+
+        Returns:
+            tuple: (prices text, place url, epoch seconds, whether the place
+                was searched rather than cached), see parse_capture()
+
+        Raises:
+            TimeoutException: prices container never became visible
+            NoSuchElementException: prices container is not on the page, or
+                no search result is loc
+        """
+
+        cached = self.place_cache.get(loc) if self.place_cache else None
+        field = None
+        metrics = self.metrics
+        started = perf_counter()
+
+        with metrics.stage('navigate'):
+            if cached is not None:
+                driver.get(cached['url']) # skip the search round trip
+            else:
+                # shorten driver.find_element_by_xpath
+                find_by_xpath = driver.find_element_by_xpath
+                field = find_by_xpath(self.xpaths['searchField'])
+                field.send_keys(loc) # type in location
+
+                field_button = find_by_xpath(self.xpaths['searchButton'])
+                field_button.click() # click search button
+
+        prices_visible = EC.visibility_of_element_located(
+            (By.CLASS_NAME, 'section-gas-prices-container')
         )
 
-    def check(self, max_window=True, dims=(1080,800)):
-        '''Opens the webridriver using Selenium.
+        try:
+            # wait for the prices, or for a list of results to pick from
+            with metrics.stage('wait'):
+                met, container = self.waits.until(driver, 'place',
+                    prices_visible, EC.visibility_of_all_elements_located(
+                        (By.CLASS_NAME, 'section-result')
+                    )
+                )
 
-        After opening the driver it begins parsing thru self.locations and
-        scraping the gas price text from the side bar.
-        '''
+            if met: # several results, open the one that is loc
+                with metrics.stage('extract'):
+                    rows = driver.execute_script(RESULTS_JS)
+                    name, _, address = split_address(loc)
+                    i = pick_result(rows, name, address)
 
-        self.driver = webdriver.Chrome(self.driver_fp)
+                if i is None:
+                    raise NoSuchElementException('No result matches ' + loc)
 
-        # set window size and go to url
-        if max_window: 
-            self.driver.maximize_window()
+                with metrics.stage('navigate'):
+                    open_result(driver, rows, i)
+                with metrics.stage('wait'):
+                    _, container = self.waits.until(driver, 'place',
+                        prices_visible)
+
+            # get prices
+            with metrics.stage('extract'):
+                raw_prices = container.text
+                url = driver.current_url
+                timestamp = time()
+
+            if self.profile is not None and self.profile.measure:
+                self.page_stats.append(page_stats(driver, started))
+
+        except (TimeoutException, NoSuchElementException):
+            if cached is not None: # cached url may be stale; search next time
+                self.place_cache.discard(loc)
+            raise
+
+        finally:
+            if field is not None:
+                field.clear()
+
+        return raw_prices, url, timestamp, cached is None
+
+    def parse_capture(self, loc, raw_prices, url, timestamp=None, searched=True):
+        """
+        The parsing half of visit(), which needs no browser: parses a
+        captured sidebar and registers the station at its coordinates.
+
+        Returns:
+            tuple: (GasPrices, GeoInfo) for the station
+        """
+
+        if timestamp is None:
+            timestamp = time()
+
+        if self.archive is not None: # to parse again if the parser was wrong
+            self.archive.add(address_zip(loc), loc, raw_prices, url, timestamp)
+
+        # parse prices and get coordinates
+        with self.metrics.stage('parse'):
+            prices = self.parse_prices(raw_prices, timestamp)
+            geo = get_latlong(url)
+
+        name, _, address = split_address(loc)
+        self.registry.register(name, address, geo.lat, geo.lon)
+
+        if searched and self.place_cache is not None:
+            self.place_cache.put(loc, url, geo.lat, geo.lon)
+
+        return prices, geo
+
+    def print_result(self, loc, prices, geo):
+        '''Prints the scraped info of a single gas station'''
+
+        print(loc,
+        "Coords: "+str(geo.lat)+", "+str(geo.lon),
+        "Disl: "+format_cents(prices.diesel),
+        "Regl: "+format_cents(prices.regular),
+        "Midg: "+format_cents(prices.midgrade),
+        "Perm: "+format_cents(prices.premium), sep='\n')
+
+    def persist(self, loc, prices):
+        '''Adds a station's prices to the store, history, registry and latest'''
+
+        with self.metrics.stage('persist'):
+            name, _, address = split_address(loc)
+            station_id = self.registry.lookup(name, address)
+            if station_id is not None: # latest prices for spatial queries
+                self.registry.update_prices(station_id, prices)
+
+            if self.store is not None:
+                self.store.add_prices(address_zip(loc), loc, prices)
+
+            if self.history is not None:
+                self.history.record(address_zip(loc), loc, prices)
+
+            if self.latest is not None:
+                self.latest.put(loc, address_zip(loc), prices, station_id)
+
+    def write_batch(self, batch):
+        """
+        Pipeline handler: parses and persists captured stations.
+
+        A station that fails to be written is queued in self.retries like a
+        failed visit, so the rest of its batch is still written.
+        """
+
+        for loc, *captured in batch:
+            try:
+                prices, geo = self.parse_capture(loc, *captured)
+                self.persist(loc, prices)
+            except Exception as e:
+                print(loc, "could not be written:", repr(e))
+                self.metrics.count('write_failed')
+                if not self.retries.failed(loc):
+                    self.metrics.count('given_up')
+                    self.unwritten.append(loc)
+                continue
+
+            self.complete(loc)
+            self.written.append((loc, prices, geo))
+
+    def complete(self, loc):
+        '''Checkpoints a persisted station, see checkpoint.TourCheckpoint'''
+
+        if self.checkpoint is not None and self.checkpoint.complete(loc):
+            self.checkpoint.commit(self.flush_prices)
+
+    def flush_prices(self):
+        '''Writes out the buffered rows of the store and history'''
+
+        if self.store is not None:
+            self.store.flush()
+
+        if self.history is not None:
+            self.history.flush()
+
+    def flush(self):
+        '''Writes out everything the tour buffered or cached'''
+
+        if self.checkpoint is not None: # logged once their prices are written
+            self.checkpoint.commit(self.flush_prices)
         else:
-            self.driver.set_window_size(*dims)
+            self.flush_prices()
 
-        self.driver.get(self.url)
+        if self.place_cache is not None:
+            self.place_cache.save()
+
+        if self.archive is not None:
+            self.archive.flush()
+
+        self.registry.save()
+
+    def tour_locations(self):
+        '''Returns self.locations without stations already listed this tour'''
+
+        self.registry.start_tour()
+        locations = []
 
         for loc in self.locations:
-            # shorten self.driver.find_element_by_xpath
-            find_by_xpath = self.driver.find_element_by_xpath
-            field = find_by_xpath(self.xpaths['searchField'])
-            field.send_keys(loc) # type in location
+            name, _, address = split_address(loc)
+            station_id = self.registry.register(
+                name, address, zipcode=address_zip(loc)
+            )
 
-            field_button = find_by_xpath(self.xpaths['searchButton'])
-            field_button.click() # click search button
+            if self.registry.first_sighting(station_id):
+                locations.append(loc)
+            else:
+                print(loc, "is listed more than once, skipped.")
 
-            try:
-                # wait for element to be visible
-                wait = WebDriverWait(self.driver, 5).until(
-                    EC.visibility_of_element_located(
-                        (By.CLASS_NAME, 'section-gas-prices-container')
+        return locations
+
+    def try_visit(self, driver, loc, raw=False):
+        """
+        visit(), or capture() if raw, that prints and returns None when the
+        station is passed.
+        """
+
+        try:
+            visit = self.capture if raw else self.visit
+            result = (loc,) + visit(driver, loc)
+
+        except TimeoutException:
+            self.metrics.count('timeout')
+            print("TimeoutException")
+            print(loc, "passed.")
+
+        except NoSuchElementException:
+            self.metrics.count('no_prices')
+            print("NoSuchElementException")
+            print(loc, "passed.")
+
+        else:
+            self.metrics.count('success')
+            return result
+
+    def iter_check(self, pool_size=1, max_window=True, dims=(1080,800),
+        ordered=True):
+        """
+        Tours self.locations and yields each station as soon as it has been
+        scraped, instead of collecting the whole tour first.
+
+        Results are also persisted as they come in, so a crash
+        midway only loses the stations still being visited. With a
+        self.checkpoint, stations whose prices were written out before a crash
+        are skipped when the tour is started again.
+
+        Stations that fail are not retried right away but queued in
+        self.retries and visited again, with exponential backoff, once the
+        rest of the tour is done.
+
+        Drivers come from self.sessions and stay warm between stations;
+        they are quit at the end unless the sessions were passed in.
+
+        With self.writers, the browsers only capture sidebars and queue them
+        on a pipeline.Pipeline; writer threads parse and persist them, and
+        the stations are yielded once written. The queue is bounded by
+        self.queue_size and drained before the tour ends or the generator is
+        closed. Stations may then be yielded out of order with several
+        writers. Stations that fail to be written are retried like failed
+        visits, and a tour with stations left unwritten keeps its
+        self.checkpoint.
+
+        Args:
+            pool_size (int, optional): number of concurrent drivers.
+            max_window (bool, optional): Maximize windows. Defaults to True.
+            dims (tuple, optional): Window dimensions if not max_window.
+            ordered (bool, optional): with a pool, yield in self.locations
+                order instead of in the order stations finish.
+
+        Yields:
+            tuple: (address, GasPrices, GeoInfo)
+        """
+
+        locations = self.tour_locations()
+        self.retries = RetryQueue(self.retry_attempts)
+        self.written = deque() # stations the writers are done with
+        self.unwritten = deque() # stations the writers gave up on
+        raw = self.writers > 0
+        pipeline = self.pipeline = Pipeline(self.write_batch, self.writers,
+            self.queue_size) if raw else None
+
+        if self.checkpoint is not None:
+            print(len(self.checkpoint), "stations already done this tour.")
+            locations = [loc for loc in locations if loc not in self.checkpoint]
+
+        try:
+            while locations:
+                if pool_size > 1:
+                    visits = self.pooled_visits(
+                        locations, pool_size, max_window, dims, ordered, raw
+                    )
+                else:
+                    visits = (
+                        (loc, self.session_visit(loc, max_window, dims, raw))
+                        for loc in locations
                     )
-                )
 
-                # get prices
-                raw_prices = self.driver.find_element_by_class_name(
-                'section-gas-prices-container').text
-
-                # parse and assign
-                self.prices = self.parse_prices(raw_prices)
-                # get coordinates
-                self.geo = get_latlong(self.driver.current_url)
-
-                # print all the info
-                print(loc,
-                "Coords: "+str(self.geo.lat)+", "+str(self.geo.lon),
-                "Disl: "+self.prices.diesel,
-                "Regl: "+self.prices.regular,
-                "Midg: "+self.prices.midgrade,
-                "Perm: "+self.prices.premium, sep='\n')
-
-            except TimeoutException:
-                print("TimeoutException")
-                print(loc, "passed.")
-                pass
-
-            except NoSuchElementException:
-                print("NoSuchElementException")
-                print(loc, "passed.")
-                pass
+                for loc, result in visits:
+                    if result is None: # station was passed
+                        if not self.retries.failed(loc):
+                            self.metrics.count('given_up')
+                            print(loc, "failed", self.retry_attempts, "times.")
+                        continue
+
+                    if pipeline is not None: # the writers take it from here
+                        pipeline.put(result)
+                        while self.written:
+                            yield self.written.popleft()
+                        continue
+
+                    self.persist(*result[:2])
+                    self.complete(loc)
+
+                    yield result
+
+                if pipeline is not None: # its failed writes are retried too
+                    pipeline.drain()
+                    while self.written:
+                        yield self.written.popleft()
+
+                locations = self.retries.next_round() # waits out the backoff
+                if locations:
+                    print("Retrying", len(locations), "stations.")
+
+            if pipeline is not None:
+                pipeline.close() # every capture is written
+                while self.written:
+                    yield self.written.popleft()
+
+            if pipeline is not None and (pipeline.errors or self.unwritten):
+                print("Some stations were not written, tour log kept.")
+            elif self.checkpoint is not None:
+                self.checkpoint.finish() # next tour starts from the top
+
+        finally:
+            if pipeline is not None:
+                pipeline.close()
+            self.flush()
+            self.metrics.export()
+            if self.own_sessions:
+                self.sessions.close()
+
+    def pooled_visits(self, locations, pool_size, max_window, dims, ordered,
+        raw=False):
+        """
+        Visits locations on a pool of driver sessions.
 
-            field.clear()
+        Each worker thread borrows an idle driver from self.sessions, visits
+        the next address and hands the driver back, so slow stations do not
+        hold up the rest of the list. Only 2 * pool_size visits are queued
+        ahead of the consumer.
+
+        Yields:
+            tuple: (address, try_visit() result) of every address
+        """
+
+        pool_size = max(1, min(pool_size, len(locations)))
+        locations = iter(locations)
+        pending = deque()
+
+        def work(loc):
+            return loc, self.session_visit(loc, max_window, dims, raw)
+
+        def start(_):
+            return self.sessions.acquire(
+                lambda: self.open_driver(max_window, dims)
+            )
+
+        try:
+            with ThreadPoolExecutor(pool_size) as pool:
+                # start all the browsers that are not warm yet at the same time
+                for driver in list(pool.map(start, range(pool_size))):
+                    self.sessions.release(driver, pages=0)
+
+                for loc in islice(locations, 2 * pool_size):
+                    pending.append(pool.submit(work, loc))
+
+                while pending:
+                    if ordered:
+                        future = pending.popleft()
+                    else:
+                        future = next(iter(wait_futures(
+                            pending, return_when=FIRST_COMPLETED
+                        ).done))
+                        pending.remove(future)
+
+                    for loc in islice(locations, 1): # keep the queue topped up
+                        pending.append(pool.submit(work, loc))
+
+                    yield future.result()
+
+        finally:
+            for future in pending:
+                future.cancel()
 
+    def check(self, max_window=True, dims=(1080,800)):
+        '''Opens the webridriver using Selenium.
+
+        After opening the driver it begins parsing thru self.locations and
+        scraping the gas price text from the side bar.
+
+        Returns the (address, GasPrices, GeoInfo) tuples of the stations
+        that were checked.
+        '''
+
+        self.results = []
+
+        for loc, self.prices, self.geo in self.iter_check(1, max_window, dims):
+            self.results.append((loc, self.prices, self.geo))
+            # print all the info
+            self.print_result(loc, self.prices, self.geo)
+
+        print_page_stats(self.page_stats)
+        self.sessions.print_stats()
+        if self.pipeline is not None:
+            self.pipeline.print_stats()
+        self.metrics.print_summary()
         print("Tour has ended.")
 
-class GasStation:
+        return self.results
 
-    def __init__(self):
+    def check_pooled(self, pool_size=4, max_window=False, dims=(1080,800)):
         """
-        Stores information for gas station results as they are being scraped
+        Same tour as check() but split across a pool of driver sessions.
+
+        Args:
+            pool_size (int, optional): number of concurrent drivers.
+            max_window (bool, optional): Maximize windows. Defaults to False.
+            dims (tuple, optional): Window dimensions if not max_window.
+
+        Returns:
+            lst: (address, GasPrices, GeoInfo) tuples in self.locations order
         """
 
-        self.has_prices = True # default; will change while scraping if True
+        self.results = list(self.iter_check(pool_size, max_window, dims))
+
+        for loc, prices, geo in self.results:
+            self.print_result(loc, prices, geo)
+
+        print_page_stats(self.page_stats)
+        self.sessions.print_stats()
+        if self.pipeline is not None:
+            self.pipeline.print_stats()
+        self.metrics.print_summary()
+        print("Tour has ended.")
+
+        return self.results
 
 class GasStationScraper:
 
-    def __init__(self, txt_fp, zipcode, stations=20):
+    def __init__(self, txt_fp, zipcode, stations=20, driver_factory=None,
+        place_cache=None, profile=None, registry=None, sessions=None,
+        metrics=None, waits=None):
         """
         Uses selenium to scrape gas station addresses in and around a zip code
         in Google Maps.
@@ -256,6 +904,17 @@ class GasStationScraper:
             fp (str): file path of '_gas_stations_{zipcode}.txt' file.
             zipcode ([type]): ZIP code from which stations will be scraped.
             stations (int, optional): number of stations to be scraped.
+            driver_factory (callable, optional): returns a new driver. Defaults
+                to a local Chrome.
+            place_cache (PlaceCache, optional): resolved place urls.
+            profile (BrowserProfile, optional): lean chrome settings.
+            registry (StationRegistry, optional): stations already listed by
+                other zip codes or pages. Defaults to one in memory.
+            sessions (SessionManager, optional): warm drivers to borrow from
+                instead of starting a new one.
+            metrics (Metrics, optional): stage timings and station counters,
+                exported when a scrape ends. Defaults to none.
+            waits (Waits, optional): timeouts learned by earlier scrapes.
         """
 
         self.url = 'https://www.google.com/maps'
@@ -265,7 +924,19 @@ class GasStationScraper:
         )
         self.gas_txt_fp = txt_fp # relative path '_gas_stations_{zipcode}.txt'
         self.driver_fp = r'chromedriver_win32/chromedriver_v79.exe'
+        self.profile = profile # browser.BrowserProfile or None
+        if driver_factory is None and profile is not None:
+            driver_factory = profile.start
+        self.driver_factory = driver_factory # None for a local Chrome
+        self.place_cache = place_cache # placecache.PlaceCache or None
+        self.page_stats = [] # filled when profile.measure is True
+        self.registry = registry if registry is not None else StationRegistry(None)
+        self.sessions = sessions # browser.SessionManager or None
+        self.metrics = metrics if metrics is not None else NULL_METRICS
+        self.waits = waits if waits is not None else Waits() # learned timeouts
+        self.driver = None
         self.scrape_depth = stations # how many stations to scrape in total
+        self.page_loads = 0 # pages loaded by the driver, for scrape() stats
         self.zipcode = zipcode
     
     def find_and_click_field(self, field_xpath, button_xpath, field_input, clear=False):
@@ -283,7 +954,7 @@ class GasStationScraper:
         field = find_by_xpath(field_xpath)
 
         if clear: # wait and clear field
-            wait = WebDriverWait(self.driver, 3).until(
+            self.waits.until(self.driver, 'clickable',
                 EC.element_to_be_clickable(
                     (By.XPATH, self.xpaths['searchField'])
                 )
@@ -303,10 +974,18 @@ class GasStationScraper:
             max_window (bool): [description]
             dims (tuple): Window dimensions if not max_window
         """
-        self.driver = webdriver.Chrome(self.driver_fp) # open web browser
+        start = lambda: start_driver(self.driver_factory, self.driver_fp)
+
+        with self.metrics.stage('driver_start'):
+            if self.sessions is not None:
+                self.driver = self.sessions.acquire(start) # may be warm already
+            else:
+                self.driver = start()
 
         # set window size
-        if max_window: 
+        if self.profile is not None:
+            self.driver.set_window_size(*self.profile.window)
+        elif max_window: 
             self.driver.maximize_window()
         else:
             self.driver.set_window_size(*dims)
@@ -314,25 +993,66 @@ class GasStationScraper:
         # go to url
         self.driver.get(self.url)
 
-    def get_results(self):
+    def extract_results(self):
+        """
+        Reads every 'section-result' row of the current results page in a
+        single script call instead of several WebDriver calls per row.
+
+        Returns:
+            lst: dicts with the name, street, has_prices and link of each row
+        """
+
+        return self.driver.execute_script(RESULTS_JS)
+
+    def get_results(self, batched=True):
         """
         Scrapes and parses gas stations search results until self.scrape_depth
         is reached and returns a list of the results as GasStation Objects.
 
+        Args:
+            batched (bool, optional): read each page with extract_results()
+                instead of querying the rows one element at a time.
+
         Returns:
             lst: returns GasStation objects with name and st address data
         """
 
-        wait = WebDriverWait(self.driver, 3).until(
-            EC.visibility_of_all_elements_located(
-                (By.CLASS_NAME, 'section-result')
+        with self.metrics.stage('wait'):
+            self.waits.until(self.driver, 'results',
+                EC.visibility_of_all_elements_located(
+                    (By.CLASS_NAME, 'section-result')
+                )
             )
-        )
 
         scraped_stations = []
-        gas_stations = self.driver.find_elements_by_class_name('section-result')
 
-        while len(scraped_stations) < self.scrape_depth:
+        while batched and len(scraped_stations) < self.scrape_depth:
+
+            with self.metrics.stage('extract'):
+                rows = self.extract_results()
+
+            for row in rows:
+                if not row['has_prices']:
+                    self.metrics.count('no_prices')
+                    print(row['name'], "has no fuel price information available.")
+                    continue
+
+                if self.is_duplicate(row['name'], row['street']):
+                    continue
+
+                gs = GasStation(row['name'], row['street'])
+                gs.url = row['link'] # None if the row is not a link
+                scraped_stations.append(gs)
+
+                if len(scraped_stations) == self.scrape_depth:
+                    break
+
+            else: # ran out of rows on this page
+                print("Next Page.")
+                if not self.next_page():
+                    break
+
+        while not batched and len(scraped_stations) < self.scrape_depth:
 
             gas_stations = self.driver.find_elements_by_class_name(
                 'section-result'
@@ -348,36 +1068,85 @@ class GasStationScraper:
                 except NoSuchElementException:
                     print(biz_name, "has no fuel price information available.")
                 else:
-                    gs = GasStation()
-                    gs.name = biz_name
-                    gs.st_ad = find_class_name('section-result-location').text
-                    scraped_stations.append(gs)
+                    gs = GasStation(
+                        biz_name, find_class_name('section-result-location').text
+                    )
+                    if not self.is_duplicate(gs.name, gs.st_ad):
+                        scraped_stations.append(gs)
 
                 if len(scraped_stations) == self.scrape_depth:
                     break
 
                 if result_index == len(gas_stations) - 1:
                     print("Next Page.")
-                    self.next_page()
+                    if not self.next_page():
+                        return scraped_stations
 
         return scraped_stations
 
+    def is_duplicate(self, name, address):
+        """
+        Registers a result in self.registry and tells if it was already listed
+        this tour, e.g. by an ad on another page or by another zip code.
+
+        Args:
+            name (str): Business name of the gas station.
+            address (str): street or full address.
+        """
+
+        station_id = self.registry.register(name, address, zipcode=self.zipcode)
+
+        if self.registry.first_sighting(station_id):
+            return False
+
+        print(name, address, "was already listed.")
+        return True
+
     def next_page(self):
-        '''Click the 'Next Page on Google Maps search results page.'''
+        """
+        Click the 'Next Page on Google Maps search results page.
+
+        Returns as soon as the rows of the current page are replaced by new
+        ones. A url change alone is not enough, maps may update it before
+        the list, and is only waited for when there were no rows to watch.
+
+        Returns:
+            bool: False if there was no next page to go to
+        """
+
+        rows = self.driver.find_elements_by_class_name('section-result')
+        url = self.driver.current_url
 
         try:
             next_button = self.driver.find_element_by_xpath(
                 '//*[@id="n7lv7yjyC35__section-pagination-button-next"]'
             ) # click 'next' button for 2nd page of gas station results
-            next_button.click()
+            with self.metrics.stage('navigate'):
+                next_button.click()
         except StaleElementReferenceException:
             print("StaleElementReferenceException: Last Page Reached?")
-            pass
+            return False
         except ElementClickInterceptedException:
             print("ElementClickInterceptedException: Last Page Reached?")
-            pass
+            return False
+        except NoSuchElementException:
+            print("NoSuchElementException: Last Page Reached.")
+            return False
+
+        self.page_loads += 1
+        if rows: # old rows detached and new ones listed
+            signal = results_replaced(rows[0])
         else:
-            sleep(2.1)
+            signal = url_changed(url, 'data=!')
+
+        try:
+            with self.metrics.stage('wait'):
+                self.waits.until(self.driver, 'next_page', signal)
+        except TimeoutException:
+            print("TimeoutException: Next Page never loaded.")
+            return False
+
+        return True
 
     def add_gas_station(self, name, address):
         """
@@ -392,228 +1161,237 @@ class GasStationScraper:
             address ([type]): Full address including city, state and zipcode.
         """
 
-        pass
+        with open(self.gas_txt_fp, 'a') as txt_file:
+            txt_file.write(gas_station_line(name, address) + '\n')
 
-    #TODO: reconsider just scraping the station name and street address from results page
-    #      then search these out through the search bar and individually instead of iterating
-    #      through a url which may change
+    def close(self, broken=False):
+        """
+        Quits the driver if one was started, or hands it back to
+        self.sessions.
 
-    def scrape_results(self, max_window=True, dims=(800,800)):
+        Args:
+            broken (bool, optional): the driver must not be reused, e.g. a
+                scrape that timed out is still running on it.
         """
-        Iterates through the results page and saves the name and street address
-        
+
+        driver, self.driver = self.driver, None
+
+        if driver is None:
+            return
+
+        if self.sessions is not None:
+            self.sessions.release(driver, self.page_loads, broken)
+        else:
+            driver.quit()
+
+    def cache_place(self, search, url):
+        """
+        Adds the place url a search resolved to into self.place_cache.
+
         Args:
-            max_window (bool, optional): Maximize window. Defaults to True.
-            dims (tuple, optional): Window dimensions. Defaults to (800,800).
+            search (str): text that was searched, e.g. name and address.
+            url (str): current_url of the gas station's place page.
         """
-        self.init_driver(max_window, dims) # start driver to url and set window
 
-        for search in [self.zipcode, 'gas stations']: # search for zip and gas
-            self.find_and_click_field(
-                self.xpaths['searchField'],
-                self.xpaths['searchButton'],
-                search,
-                True # wait and clear the search field
-            )
+        if self.place_cache is not None and '/@' in url:
+            geo = get_latlong(url)
+            self.place_cache.put(search, url, geo.lat, geo.lon)
 
-        self.gs_list = self.get_results() # gas station list
+    def open_place(self, g):
+        """
+        Opens the place page of a gas station found by get_results() and reads
+        its full address into g.address.
 
-        # and get full address
-        # TODO: sometimes during multi-page scraping ads will make duplicates
-        for g in self.gs_list:
-            self.find_and_click_field(
-                self.xpaths['searchField'],
-                '//*[@id="searchbox-searchbutton"]',
-                ' '.join([g.name, g.st_ad]), # concactenate name and st address
-                True
-            )
-            try:
-                wait = WebDriverWait(self.driver, 2).until(
-                    EC.visibility_of_all_elements_located(
-                        (By.CLASS_NAME, 'section-info-line')
-                    ) # wait for info to load in sidebar
+        Goes straight to g.url (the results row link) or the cached place url
+        when there is one; otherwise searches the name and street address and
+        opens the result matching g if there are several, see pick_result().
+
+        Args:
+            g (GasStation): station with name and st_ad.
+
+        Returns:
+            bool: False if the place page could not be opened
+        """
+
+        search = ' '.join([g.name, g.st_ad]) # concactenate name and st address
+        cached = None
+
+        if g.url is None and self.place_cache is not None:
+            cached = self.place_cache.get(search)
+
+        url = g.url or (cached['url'] if cached else None)
+        metrics = self.metrics
+        started = perf_counter()
+
+        with metrics.stage('navigate'):
+            if url is not None: # no search and no multiple results to pick
+                self.driver.get(url)
+            else:
+                self.find_and_click_field(
+                    self.xpaths['searchField'],
+                    '//*[@id="searchbox-searchbutton"]',
+                    search,
+                    True
                 )
-            except TimeoutException:
-                # in case of multiple results, click the first top one
-                try:
-                    # usually this is the right xpath
-                    self.driver.find_element_by_xpath(
-                    '//*[@id="pane"]/div/div[1]/div/div/div[4]/div[1]/div[1]'
-                    ).click()
-                except:
-                    # sometimes the above xpath does not work
-                    self.driver.find_element_by_xpath(
-                    '//*[@id="pane"]/div/div[1]/div/div/div[2]/div[1]/div[1]'
-                    ).click()
-                finally:
-                    wait = WebDriverWait(self.driver, 2).until(
+        self.page_loads += 1
+
+        info = EC.visibility_of_all_elements_located(
+            (By.CLASS_NAME, 'section-info-line')
+        ) # info loaded in sidebar
+
+        try:
+            with metrics.stage('wait'):
+                if url is not None: # a link only ever opens a place page
+                    self.waits.until(self.driver, 'info', info)
+                else: # the place page, or a list of namesakes
+                    met, _ = self.waits.until(self.driver, 'info', info,
                         EC.visibility_of_all_elements_located(
-                            (By.CLASS_NAME, 'section-info-line')
-                        ) # wait for info to load in sidebar
+                            (By.CLASS_NAME, 'section-result')
+                        )
                     )
-
+                    if met: # multiple results, open the one that is g
+                        rows = self.extract_results()
+                        i = pick_result(rows, g.name, g.st_ad)
+                        if i is None:
+                            print("No result matches:", search)
+                            return False
+                        open_result(self.driver, rows, i)
+                        self.page_loads += 1
+                        self.waits.until(self.driver, 'info', info)
+        except TimeoutException:
+            if url is None:
+                print("No place page found for:", search)
+            else: # link did not open a place page
+                print("TimeoutException @ open_place for:", search)
+                if cached is not None:
+                    self.place_cache.discard(search)
+            return False
+
+        with metrics.stage('extract'):
             g.address = self.driver.find_element_by_class_name(
                 'section-info-line'
             ).text # get full address
+            g.url = self.driver.current_url
 
-        # debug
-        for g in self.gs_list:
-            print(g.name, g.address)
-        
+        if self.profile is not None and self.profile.measure:
+            self.page_stats.append(page_stats(self.driver, started))
 
+        if '/@' in g.url:
+            geo = get_latlong(g.url)
+            g.lat, g.lon = geo.lat, geo.lon
 
+        self.registry.register(g.name, g.address, g.lat, g.lon, self.zipcode)
 
+        if cached is None:
+            self.cache_place(search, g.url)
 
-    def scrape(self, max_window=True, dims=(1000,800)):
+        return True
+
+    def search_gas_stations(self, max_window, dims):
+        '''Starts the driver and searches for gas stations in self.zipcode'''
+
+        self.init_driver(max_window, dims) # start driver to url and set window
+        self.page_loads = 1
+
+        for search in [self.zipcode, 'gas stations']: # search for zip and gas
+            with self.metrics.stage('navigate'):
+                self.find_and_click_field(
+                    self.xpaths['searchField'],
+                    self.xpaths['searchButton'],
+                    search,
+                    True # wait and clear the search field
+                )
+            self.page_loads += 1
+
+    def scrape_results(self, max_window=True, dims=(800,800)):
         """
-        After opening the driver it begins parsing thru 'gas staion' search
-        results after a ZIP code search. It idenitified gas stations with fuel
-        price data and begins scraping their name and address, and then
-        ppulates the '_gas_stations_{zipcode}.txt' file.
-        '''
+        Iterates through the results page and saves the name and street address
         
         Args:
             max_window (bool, optional): Maximize window. Defaults to True.
-            dims (tuple, optional): Window dimensions. Defaults to (1080,800).
+            dims (tuple, optional): Window dimensions. Defaults to (800,800).
         """
-        self.driver = webdriver.Chrome(self.driver_fp) # open web browser
-
-        # set window size
-        if max_window: 
-            self.driver.maximize_window()
-        else:
-            self.driver.set_window_size(*dims)
+        self.search_gas_stations(max_window, dims)
 
-        # go to url
-        self.driver.get(self.url)
-
-        # do zip code search
-        find_by_xpath = self.driver.find_element_by_xpath # shorten func call
-        field = find_by_xpath(self.xpaths['searchField'])
-        field.send_keys(self.zipcode) # type in zipcode
-
-        field_button = find_by_xpath(self.xpaths['searchButton'])
-        field_button.click() # click search button
+        self.gs_list = self.get_results() # gas station list
 
-        # wait for search field to be interactable before clearing field
-        wait = WebDriverWait(self.driver, 3).until(
-            EC.element_to_be_clickable(
-                (By.XPATH, self.xpaths['searchField'])
-            )
-        )
+        # and get full address
+        # duplicates from ads on several pages were dropped by get_results
+        for g in self.gs_list:
+            self.metrics.count('success' if self.open_place(g) else 'failed')
 
-        # do gas stations search
-        field.clear()
-        field.send_keys('gas stations')
-        field_button.click()
+        if self.place_cache is not None:
+            self.place_cache.save()
 
-        scraped_stations = [] # store the stations with fuel price information
+        self.registry.save()
+        self.metrics.export()
 
-        wait = WebDriverWait(self.driver, 6).until( # wait for full url to load
-            EC.url_contains("data=!3m1!4b1")
-        )
+        # debug
+        for g in self.gs_list:
+            print(g.name, g.address)
 
-        # search results url
-        results_page_url = self.driver.current_url
+    def scrape(self, max_window=True, dims=(1000,800)):
+        """
+        After opening the driver it begins parsing thru 'gas staion' search
+        results after a ZIP code search. It idenitified gas stations with fuel
+        price data and begins scraping their name and address, and then
+        ppulates the '_gas_stations_{zipcode}.txt' file.
 
-        while len(scraped_stations) < self.scrape_depth:
+        The links of all the priced results are collected first and then
+        visited one by one, so the results page is never reloaded between
+        stations. self.page_loads counts every page the driver loaded.
+        Stations whose page fails to load are retried at the end.
+        
+        Args:
+            max_window (bool, optional): Maximize window. Defaults to True.
+            dims (tuple, optional): Window dimensions. Defaults to (1080,800).
 
-            # wait for 'section-result' elements to load before scraping
-            wait = WebDriverWait(self.driver, 3).until(
-                EC.visibility_of_all_elements_located(
-                    (By.CLASS_NAME, 'section-result')
-                )
-            )
+        Returns:
+            lst: GasStation objects with name, address and url
+        """
+        self.search_gas_stations(max_window, dims)
 
-            gas_stations = self.driver.find_elements_by_class_name(
-                'section-result' # get all section results
+        with self.metrics.stage('wait'):
+            self.waits.until(self.driver, 'search', # wait for full url
+                EC.url_contains("data=!3m1!4b1")
             )
 
-            for i in range(len(gas_stations)):
-
-                # shorten call
-                find_class_name = gas_stations[i].find_element_by_class_name
-                # get gas station name for debugging
-                station_name = find_class_name('section-result-title').text
-
-                try: # check for gas price availability
-                    has_info = find_class_name('section-result-annotation')
-                    gs = GasStation()
-                    gas_stations[i].click()
-
-                    # wait for address info to load
-                    wait = WebDriverWait(self.driver, 2).until(
-                        EC.visibility_of_all_elements_located(
-                            (By.CLASS_NAME, 'section-info-line')
-                        )
-                    )
-
-                    gs.name = station_name
-
-                    gs.address = self.driver.find_elements_by_class_name(
-                        'section-info-line'
-                    )[0].text # gas station full address
+        # store the stations with fuel price information
+        scraped_stations = []
 
-                    gs.url = self.driver.current_url # url for gas station
+        retries = RetryQueue()
+        stations = self.get_results() # collect links of every priced result
 
+        while stations:
+            for gs in stations:
+                if self.open_place(gs):
+                    self.metrics.count('success')
                     scraped_stations.append(gs) # add GasStation to list
 
                     #debug
                     print(gs.name, gs.address, gs.has_prices)
 
-                    self.driver.get(results_page_url)
-
-                    wait = WebDriverWait(self.driver, 3).until(
-                        EC.visibility_of_all_elements_located(
-                            (By.CLASS_NAME, 'section-result')
-                        )
-                    )
-                    
-                    gas_stations = self.driver.find_elements_by_class_name(
-                        'section-result' # get all section results
-                    )
-
-                except ElementClickInterceptedException:
-                    print("ElementClickInterceptedException: @ has_info")
-                    pass
-                except NoSuchElementException: # no gas prices found in element
-                    print("NoSuchElementException @ has_info for:", station_name)
-                    pass
-                except StaleElementReferenceException: # element not found
-                    print("StaleElementReferenceException @ has_info")
-                    pass
-
-                # when the amount of stations with fuel price wanted
-                if len(scraped_stations) == self.scrape_depth:
-                    break
+                elif not retries.failed(gs): # retried after the others
+                    self.metrics.count('given_up')
+                    print(gs.name, "failed", retries.attempts, "times.")
 
-            try:
-                if len(scraped_stations) == self.scrape_depth: # skip
-                    break
+            stations = retries.next_round() # waits out the backoff
 
-                next_button = self.driver.find_element_by_xpath(
-                    '//*[@id="n7lv7yjyC35__section-pagination-button-next"]'
-                ) # click 'next' button for 2nd page of gas station results
-                next_button.click()
+        if self.place_cache is not None:
+            self.place_cache.save()
 
-                wait = WebDriverWait(self.driver, 6).until( # wait for full url to load
-                    EC.url_contains("data=!3m1!4b1")
-                )
+        self.registry.save()
+        self.gs_list = scraped_stations
 
-                results_page_url = self.driver.current_url # search results url
-
-            except NoSuchElementException:
-                print("NoSuchElementException: Last Page Reached.")
-                break
-            except StaleElementReferenceException:
-                print("StaleElementReferenceException: Last Page Reached.")
-                break
-            except ElementClickInterceptedException:
-                print("ElementClickInterceptedException: Last Page Reached.")
-                break
-        
         # after reaching scape_depth write gas stations addresses to text file
         print("gs list length:", len(scraped_stations))
+        print("page loads per station:",
+            round(self.page_loads / max(1, len(scraped_stations)), 2))
+        print_page_stats(self.page_stats)
+        self.metrics.print_summary()
+        self.metrics.export()
+
+        return scraped_stations
 
 
 ''' dir() of:
@@ -0,0 +1,160 @@
+# Python 3.7.1 - LRU cache of the latest prices of each station
+
+from bisect import bisect_left, insort
+from collections import OrderedDict
+import threading
+
+from records import FUELS, MISSING, GasPrices
+from registry import StationRegistry, split_address, station_id
+
+class LatestPrices:
+    """
+    Size bounded LRU cache of the latest prices of each station, keyed by
+    registry station id. The cached stations of every zip code and, per
+    fuel, the cached stations sorted by price are kept alongside.
+
+    Tours feed it through put(). A zip code or station that is not cached is
+    read from the PriceStore once, on the first query, and served from
+    memory after that.
+
+    Args:
+        store (PriceStore): where tours write their prices.
+        registry (StationRegistry, optional): gives stations their ids.
+        capacity (int, optional): stations kept in memory.
+        days (int, optional): newest day partitions read on a cache miss.
+    """
+
+    def __init__(self, store, registry=None, capacity=10000, days=2):
+        self.store = store
+        self.registry = registry if registry is not None else StationRegistry(None)
+        self.capacity = capacity
+        self.days = days
+        self.lock = threading.Lock() # shared by the tour and request threads
+        self.entries = OrderedDict() # id: {id, station, zipcode, timestamp, prices}
+        self.zips = {} # zipcode: ids cached
+        self.complete = set() # zip codes read from disk and not evicted since
+        self.by_price = {fuel: [] for fuel in FUELS} # sorted (cents, id)
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def station_id(self, station):
+        '''Returns the registry id of a '{name} {address}' station'''
+
+        name, _, address = split_address(station)
+        found = self.registry.lookup(name, address)
+        return found if found is not None else station_id(name, address)
+
+    def _unindex(self, entry):
+        for fuel, cents in entry['prices'].items():
+            if cents is not None:
+                column = self.by_price[fuel]
+                del column[bisect_left(column, (cents, entry['id']))]
+
+    def put(self, station, zipcode, prices, station_id=None):
+        """
+        Caches the prices of a station, unless newer ones are cached.
+
+        Args:
+            station (str): station name and address.
+            zipcode (str): zip code folder of the station.
+            prices (GasPrices): prices found.
+            station_id (str, optional): registry id, looked up if None.
+        """
+
+        if station_id is None:
+            station_id = self.station_id(station)
+
+        entry = dict(id=station_id, station=station, zipcode=zipcode,
+            timestamp=prices.timestamp, prices={
+                fuel: None if cents == MISSING else cents
+                for fuel, cents in zip(FUELS, prices.cents())
+            })
+
+        with self.lock:
+            old = self.entries.pop(station_id, None)
+            if old is not None:
+                self._unindex(old)
+                if old['timestamp'] > entry['timestamp']:
+                    entry = old
+
+            self.entries[station_id] = entry
+            self.zips.setdefault(zipcode, set()).add(station_id)
+            for fuel, cents in entry['prices'].items():
+                if cents is not None:
+                    insort(self.by_price[fuel], (cents, station_id))
+
+            while len(self.entries) > self.capacity:
+                _, evicted = self.entries.popitem(last=False)
+                self._unindex(evicted)
+                self.zips[evicted['zipcode']].discard(evicted['id'])
+                self.complete.discard(evicted['zipcode'])
+
+    def load_zip(self, zipcode):
+        '''Caches the latest prices of a zip code's stations from disk'''
+
+        latest = {} # station: [timestamp, {fuel: cents}]
+
+        for timestamp, station, fuel, cents in self.store.read(
+            zipcode, days=self.days):
+            last = latest.setdefault(station, [timestamp, {}])
+            if timestamp > last[0]: # a newer check of the station
+                last[:] = [timestamp, {}]
+            if timestamp == last[0]:
+                last[1][fuel] = cents
+
+        for station, (timestamp, cents) in latest.items():
+            self.put(station, zipcode, GasPrices(
+                *(cents.get(fuel, MISSING) for fuel in FUELS), timestamp
+            ))
+
+        with self.lock:
+            self.complete.add(zipcode)
+
+    def zip(self, zipcode):
+        '''Returns the stations of a zip code'''
+
+        if zipcode not in self.complete:
+            self.misses += 1
+            self.load_zip(zipcode)
+        else:
+            self.hits += 1
+
+        with self.lock:
+            entries = []
+            for i in self.zips.get(zipcode, ()):
+                if i in self.entries:
+                    self.entries.move_to_end(i)
+                    entries.append(self.entries[i])
+
+            return entries
+
+    def station(self, station_id):
+        '''Returns the entry of a station id, or None if it is unknown'''
+
+        with self.lock:
+            entry = self.entries.get(station_id)
+            if entry is not None:
+                self.entries.move_to_end(station_id)
+                self.hits += 1
+                return entry
+
+        self.misses += 1
+        known = self.registry.stations.get(station_id)
+        for zipcode in known['zipcodes'] if known is not None else ():
+            self.load_zip(zipcode)
+
+        with self.lock:
+            return self.entries.get(station_id)
+
+    def cheapest(self, fuel='regular', n=10, zipcode=None):
+        '''Returns the n cheapest stations for a fuel, in zipcode or cached'''
+
+        if zipcode is not None:
+            priced = [e for e in self.zip(zipcode) if e['prices'][fuel] is not None]
+            return sorted(priced, key=lambda e: e['prices'][fuel])[:n]
+
+        with self.lock:
+            return [self.entries[i] for _, i in self.by_price[fuel][:n]]
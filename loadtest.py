@@ -0,0 +1,130 @@
+# Python 3.7.1 - requests/sec of the price service under concurrent clients
+
+import argparse
+import http.client
+import json
+import random
+import shutil
+import tempfile
+import threading
+from time import perf_counter
+from urllib.parse import urlparse
+
+from pricestore import PriceStore
+from records import GasPrices
+from service import LatestPrices, serve
+
+def percentile(values, pct):
+    '''Returns the pct percentile of values (nearest rank)'''
+
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def generate(store, zipcodes, stations):
+    '''Writes one check of stations stations per zip code to store'''
+
+    rng = random.Random(0)
+
+    for zipcode in zipcodes:
+        for i in range(stations):
+            reg = rng.randint(250, 400)
+            store.add_prices(zipcode,
+                'Station {} {} Main St, Yuma, AZ {}'.format(i, 100 + i, zipcode),
+                GasPrices(reg + 60, reg, reg + 40, reg + 70))
+
+    store.flush()
+
+def client(host, port, paths, requests, latencies, errors):
+    '''Sends requests GETs over one keep-alive connection'''
+
+    connection = http.client.HTTPConnection(host, port)
+    times = []
+
+    for i in range(requests):
+        started = perf_counter()
+        connection.request('GET', paths[i % len(paths)])
+        response = connection.getresponse()
+        response.read()
+        times.append(perf_counter() - started)
+
+        if response.status != 200:
+            errors.append(response.status)
+
+    connection.close()
+    latencies.extend(times)
+
+def run(host, port, paths, clients, requests):
+    """
+    Runs clients threads of requests GETs each over paths and prints the
+    throughput and latency percentiles.
+    """
+
+    latencies, errors = [], []
+    threads = [threading.Thread(target=client, args=(
+        host, port, random.sample(paths, len(paths)), requests, latencies, errors
+    )) for _ in range(clients)]
+
+    started = perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = perf_counter() - started
+
+    print('{} clients: {} requests in {:.2f}s, {:.0f} requests/sec, {} errors'
+        .format(clients, len(latencies), elapsed, len(latencies) / elapsed,
+            len(errors)))
+    print('  latency p50={:.2f}ms p99={:.2f}ms'.format(
+        1000 * percentile(latencies, 50), 1000 * percentile(latencies, 99)))
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Measures requests/sec of service.py'
+    )
+    parser.add_argument('--url',
+        help='running service to test, e.g. http://127.0.0.1:8000; by '
+        'default one is started here on generated prices')
+    parser.add_argument('--zipcodes', nargs='*', default=['85364'],
+        help='zip codes to query on a running service')
+    parser.add_argument('--clients', type=int, nargs='*', default=[1, 4, 16])
+    parser.add_argument('--requests', type=int, default=2000,
+        help='requests per client')
+    args = parser.parse_args()
+
+    folder = None
+
+    if args.url is None: # a local service over 20 zip codes of 25 stations
+        folder = tempfile.mkdtemp()
+        store = PriceStore(folder, batch_size=100000)
+        zipcodes = [str(85300 + i) for i in range(20)]
+        generate(store, zipcodes, 25)
+
+        server = serve(LatestPrices(store), port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        host, port = server.server_address
+    else:
+        zipcodes = args.zipcodes
+        url = urlparse(args.url)
+        host, port = url.hostname, url.port or 80
+
+    try:
+        connection = http.client.HTTPConnection(host, port)
+        station_ids = []
+        for zipcode in zipcodes: # warms the cache and collects station ids
+            connection.request('GET', '/zip/' + zipcode)
+            station_ids += [e['id'] for e in json.loads(connection.getresponse().read())]
+        connection.close()
+
+        paths = ['/zip/' + z for z in zipcodes] + \
+            ['/station/' + i for i in station_ids] + \
+            ['/cheapest?fuel=' + f for f in ('regular', 'diesel', 'premium')]
+
+        for clients in args.clients:
+            run(host, port, paths, clients, args.requests)
+    finally:
+        if folder is not None:
+            server.shutdown()
+            shutil.rmtree(folder)
+
+if __name__ == '__main__':
+    main()
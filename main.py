@@ -1,34 +1,187 @@
 # Python 3.7.1 - Briant J. Fabela (12/26/2019)
 
-from selenium import webdriver # selenium v3.141.0
+# command line entry point:
+# python main.py {discover,check,export,reparse,query} ...
+#
+# selenium and the driver stack (helpfuncs, browser, waits) are imported by
+# the subcommands that drive a browser only, so export and query start
+# without paying for them. See benchmark_startup.py.
 
-# for 'explicit' wait implementation
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-
-# tests
+import argparse
 import os
+from time import perf_counter
+
+from pricestore import PriceStore
+from records import FUELS, format_cents
+
+def discover(args):
+    '''Finds the priced gas stations of zip codes, see populate_gas_stations()'''
+
+    from browser import BrowserProfile
+    from helpfuncs import make_file_structure, populate_gas_stations
+
+    for zipcode in args.zipcodes: # new zip codes to track
+        make_file_structure(zipcode, args.fp)
+
+    populate_gas_stations(args.stations, args.fp, args.concurrency,
+        args.timeout, profile=BrowserProfile(headless=not args.show))
+
+def check(args):
+    '''Tours a list of gas stations and stores their prices'''
+
+    from archive import CaptureArchive
+    from browser import BrowserProfile
+    from checkpoint import TourCheckpoint
+    from helpfuncs import GasPriceChecker
+    from metrics import Metrics
+    from placecache import PlaceCache
+    from pricestore import PriceHistory
+    from registry import StationRegistry
+
+    addresses = args.addresses
+    if addresses.isdigit(): # a zip code: its discovered stations
+        addresses = os.path.join(args.fp, addresses,
+            '_gas_stations_' + addresses + '.txt')
+
+    with PriceStore(args.fp) as store, PriceHistory(args.fp) as history:
+        checker = GasPriceChecker(
+            'https://www.google.com/maps', GasPriceChecker.xpaths, addresses,
+            profile=BrowserProfile(headless=not args.show), store=store,
+            history=history, place_cache=PlaceCache(
+                os.path.join(args.fp, '_place_cache.json')),
+            registry=StationRegistry(os.path.join(args.fp, '_stations.json')),
+            checkpoint=TourCheckpoint(
+                os.path.join(args.fp, '_tour.log')) if args.resume else None,
+            writers=args.writers, archive=None if args.no_archive else
+                CaptureArchive(os.path.join(args.fp, '_archive')),
+            metrics=Metrics(args.metrics) if args.metrics else None
+        )
+        checker.check_pooled(args.pool)
+
+def export(args):
+    '''Writes the one-column-per-station fuel csvs of zip codes'''
+
+    store = PriceStore(args.fp)
+    stored = store.zipcodes()
+
+    for zipcode in args.zipcodes or stored:
+        if zipcode not in stored:
+            print("No prices stored for zip code", zipcode, "in", args.fp)
+            continue
+
+        store.export_wide(zipcode)
+        print(zipcode, "exported to", os.path.join(args.fp, zipcode))
+
+def reparse(args):
+    '''Rebuilds the price store from the archived raw captures'''
+
+    from archive import CaptureArchive, reparse as reparse_archive
+
+    started = perf_counter()
+    total = reparse_archive(CaptureArchive(os.path.join(args.fp, '_archive')),
+        args.out or args.fp, args.parser, args.processes, args.start, args.end)
+
+    print(total, "captures parsed in",
+        round(perf_counter() - started, 2), "seconds.")
+
+def query(args):
+    '''Prints the latest prices of a zip code or a station'''
+
+    from latest import LatestPrices
+    from registry import StationRegistry
+
+    store = PriceStore(args.fp)
+    prices = LatestPrices(store,
+        StationRegistry(os.path.join(args.fp, '_stations.json')))
+
+    if args.station is not None:
+        entries = [prices.station(args.station)]
+        if entries[0] is None:
+            print("Unknown station:", args.station)
+            return
+    else:
+        if args.zipcode is None: # every zip code competes
+            for zipcode in store.zipcodes():
+                prices.load_zip(zipcode)
+        entries = prices.cheapest(args.fuel, args.n, args.zipcode)
+
+    print('id'.ljust(12), ' '.join(fuel[:5].rjust(5) for fuel in FUELS), 'station')
+    for entry in entries:
+        print(entry['id'], ' '.join(
+            ('-' if cents is None else format_cents(cents)).rjust(5)
+            for cents in (entry['prices'][fuel] for fuel in FUELS)
+        ), entry['station'])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Scrapes gas prices from google maps'
+    )
+    parser.add_argument('--fp', default='fuel_prices',
+        help='directory of the zip code folders')
+    commands = parser.add_subparsers(dest='command')
+
+    command = commands.add_parser('discover',
+        help='find gas stations with prices in the zip code folders')
+    command.add_argument('zipcodes', nargs='*',
+        help='zip codes to add folders for first')
+    command.add_argument('--stations', type=int, default=20,
+        help='stations per zip code')
+    command.add_argument('--concurrency', type=int, default=4)
+    command.add_argument('--timeout', type=int, default=300,
+        help='seconds allowed per zip code')
+    command.add_argument('--show', action='store_true',
+        help='show the browser windows')
+    command.set_defaults(func=discover)
 
-from helpfuncs import GasStationScraper
+    command = commands.add_parser('check', help='scrape the prices of stations')
+    command.add_argument('addresses',
+        help='address file, or a zip code to check its discovered stations')
+    command.add_argument('--pool', type=int, default=4, help='browsers to use')
+    command.add_argument('--resume', action='store_true',
+        help='skip the stations an interrupted tour already checked')
+    command.add_argument('--no-archive', action='store_true',
+        help='do not keep the raw captures for reparse')
+    command.add_argument('--writers', type=int, default=1,
+        help='threads parsing and saving prices off the browser threads, '
+        '0 for none')
+    command.add_argument('--metrics', metavar='PATH',
+        help='write stage timings and station counts to PATH.prom and '
+        'PATH.json')
+    command.add_argument('--show', action='store_true',
+        help='show the browser windows')
+    command.set_defaults(func=check)
 
-gas_txt_path = os.path.normpath('fuel_prices\85364\_gas_stations_85364.txt')
-zipcode = '85364'
+    command = commands.add_parser('export',
+        help='write {fuel}.csv files with a column per station')
+    command.add_argument('zipcodes', nargs='*', help='all zip codes if none')
+    command.set_defaults(func=export)
 
-gss = GasStationScraper(gas_txt_path, zipcode, 20)
-gss.scrape_results()
+    command = commands.add_parser('reparse',
+        help='parse the archived captures again and replace their prices')
+    command.add_argument('--parser', choices=['labels', 'fixed'],
+        default='labels', help='read grades by label or by position')
+    command.add_argument('--processes', type=int,
+        help='worker processes, one per cpu if not given')
+    command.add_argument('--start', help='first day, YYYY-MM-DD')
+    command.add_argument('--end', help='last day, YYYY-MM-DD')
+    command.add_argument('--out', help='store to write, --fp if not given')
+    command.set_defaults(func=reparse)
 
-'''
-for zipcode in ['85364']:
-    make_file_structure(zipcode)
+    command = commands.add_parser('query', help='print the latest prices')
+    command.add_argument('zipcode', nargs='?',
+        help='zip code to list, every zip code if none')
+    command.add_argument('--fuel', choices=FUELS, default='regular',
+        help='fuel to sort by')
+    command.add_argument('-n', type=int, default=10, help='stations to list')
+    command.add_argument('--station', help='registry id of one station')
+    command.set_defaults(func=query)
 
-helpfuncs.create_csv('fuel_prices/92231', 'diesel.csv')
+    args = parser.parse_args(argv)
 
-headers = ['timestamp', 'Chevron 123 Main Street']
-body  = ['01/01/2020', '3.49']
+    if args.command is None:
+        parser.print_help()
+    else:
+        args.func(args)
 
-with open('fuel_prices/92231/diesel.csv', 'w', newline='') as csv_file:
-    csv_writer = csv.writer(csv_file)
-    for row in [headers, body]:
-        csv_writer.writerow(row)
-'''
\ No newline at end of file
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+# Python 3.7.1 - per-stage latency histograms and station counters
+
+from bisect import bisect_left
+import json
+import os
+import threading
+from time import perf_counter
+
+STAGES = ('driver_start', 'navigate', 'wait', 'extract', 'parse', 'persist')
+# upper bounds in seconds, like prometheus histogram buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+class Histogram:
+    '''Counts of observed seconds per bucket, plus their sum'''
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1) # last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def quantile(self, q):
+        '''Upper bound of the bucket the q quantile falls in'''
+
+        rank, seen = q * self.count, 0
+
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+
+class Stage:
+    '''Context manager that observes the seconds its block took'''
+
+    __slots__ = ('metrics', 'name', 'started')
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.started = perf_counter()
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, perf_counter() - self.started)
+
+class Metrics:
+    """
+    Latency histograms per scraping stage and counters per station outcome,
+    shared by every driver of a tour.
+
+        with metrics.stage('navigate'):
+            driver.get(url)
+        metrics.count('success')
+
+    export() writes them as prometheus text to '{fp}.prom' and as a json
+    summary to '{fp}.json'.
+
+    Args:
+        fp (str, optional): path of the exports without extension. None to
+            only keep them in memory.
+        buckets (tuple, optional): histogram bucket bounds in seconds.
+    """
+
+    enabled = True
+
+    def __init__(self, fp=os.path.join('fuel_prices', '_metrics'),
+        buckets=BUCKETS):
+        self.fp = fp
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.histograms = {stage: Histogram(buckets) for stage in STAGES}
+        self.counters = {}
+
+    def stage(self, name):
+        return Stage(self, name)
+
+    def observe(self, name, seconds):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def prometheus(self, prefix='gasscraper'):
+        '''Returns the metrics in the prometheus text exposition format'''
+
+        name = prefix + '_stage_seconds'
+        lines = ['# HELP ' + name + ' Seconds spent per scraping stage.',
+            '# TYPE ' + name + ' histogram']
+
+        with self.lock:
+            for stage, histogram in self.histograms.items():
+                cumulative = 0
+                bounds = [str(b) for b in histogram.buckets] + ['+Inf']
+
+                for bound, count in zip(bounds, histogram.counts):
+                    cumulative += count
+                    lines.append('{}_bucket{{stage="{}",le="{}"}} {}'.format(
+                        name, stage, bound, cumulative))
+
+                lines.append('{}_sum{{stage="{}"}} {}'.format(
+                    name, stage, histogram.sum))
+                lines.append('{}_count{{stage="{}"}} {}'.format(
+                    name, stage, histogram.count))
+
+            name = prefix + '_stations_total'
+            lines += ['# HELP ' + name + ' Stations visited per outcome.',
+                '# TYPE ' + name + ' counter']
+            lines += ['{}{{outcome="{}"}} {}'.format(name, outcome, count)
+                for outcome, count in sorted(self.counters.items())]
+
+        return '\n'.join(lines) + '\n'
+
+    def summary(self):
+        '''Returns {stages: {stage: {count, seconds, mean, p50, p95}}, counters}'''
+
+        with self.lock:
+            stages = {stage: dict(count=h.count, seconds=round(h.sum, 6),
+                    mean=round(h.sum / h.count, 6), p50=h.quantile(0.5),
+                    p95=h.quantile(0.95))
+                for stage, h in self.histograms.items() if h.count}
+
+            return dict(stages=stages, counters=dict(self.counters))
+
+    def export(self):
+        '''Writes '{fp}.prom' and '{fp}.json', e.g. at the end of a tour'''
+
+        if self.fp is None:
+            return
+
+        folder = os.path.dirname(self.fp)
+        if folder and not os.path.isdir(folder):
+            os.makedirs(folder)
+
+        for path, text in [(self.fp + '.prom', self.prometheus()),
+            (self.fp + '.json', json.dumps(self.summary(), indent=1))]:
+            with open(path + '.tmp', 'w') as export_file:
+                export_file.write(text)
+            os.replace(path + '.tmp', path)
+
+    def print_summary(self):
+        '''Prints the mean and p95 seconds of every stage and the counters'''
+
+        summary = self.summary()
+
+        for stage, s in summary['stages'].items():
+            print(stage + ": n=" + str(s['count']),
+                "mean=" + str(round(s['mean'], 3)), "p95<=" + str(s['p95']))
+
+        for outcome, count in sorted(summary['counters'].items()):
+            print(outcome + ": " + str(count))
+
+class NullStage:
+    '''Stage that times nothing'''
+
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc):
+        pass
+
+class NullMetrics:
+    '''Metrics that record nothing, used when instrumentation is off'''
+
+    enabled = False
+    _stage = NullStage()
+
+    def stage(self, name):
+        return self._stage
+
+    def observe(self, name, seconds):
+        pass
+
+    def count(self, name, n=1):
+        pass
+
+    def export(self):
+        pass
+
+    def print_summary(self):
+        pass
+
+NULL_METRICS = NullMetrics()
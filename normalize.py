@@ -0,0 +1,229 @@
+# Python 3.7.1 - address normalization and fuzzy matching of gas stations
+
+import re
+
+# usps street suffix abbreviations
+SUFFIXES = dict(
+    alley='aly', avenue='ave', av='ave', boulevard='blvd', circle='cir',
+    court='ct', crossing='xing', drive='dr', expressway='expy', freeway='fwy',
+    highway='hwy', hiway='hwy', lane='ln', parkway='pkwy', place='pl',
+    plaza='plz', road='rd', route='rte', square='sq', street='st', str='st',
+    terrace='ter', trail='trl',
+)
+DIRECTIONALS = dict(
+    north='n', south='s', east='e', west='w', northeast='ne', northwest='nw',
+    southeast='se', southwest='sw',
+)
+ORDINALS = dict(
+    first='1st', second='2nd', third='3rd', fourth='4th', fifth='5th',
+    sixth='6th', seventh='7th', eighth='8th', ninth='9th', tenth='10th',
+)
+DIRECTIONS = set(DIRECTIONALS.values())
+WORDS = dict(SUFFIXES, **DIRECTIONALS, **ORDINALS)
+# designators followed by a unit number, e.g. 'Ste 5', 'Unit B'
+UNITS = {'apt', 'apartment', 'bldg', 'building', 'spc', 'ste', 'suite', 'unit'}
+# dropped from names: 'Circle K #2705', 'Pilot Travel Centers LLC'
+NAME_NOISE = {'co', 'corp', 'inc', 'llc', 'the'}
+
+def tokens(text):
+    '''Lower cased words of text with punctuation other than # dropped'''
+
+    return re.sub(r'[^\w#\s]', ' ', text.lower().replace("'", '')).split()
+
+def parse_street(street):
+    """
+    Splits a street address into its house number, canonical words and unit.
+
+    Suffixes, directionals and spelled out ordinals are abbreviated, so
+    '1825 South Fourth Avenue' and '1825 S 4th Ave' give the same words.
+
+    Args:
+        street (str): e.g. '1600 S Avenue B #5121'; anything after the first
+            comma (city, state and zip code) is ignored.
+
+    Returns:
+        tuple: (house number or None, [words], unit or None)
+    """
+
+    words = tokens(street.split(',')[0])
+    number = unit = None
+    canonical = []
+    i = 0
+
+    while i < len(words):
+        word = words[i]
+
+        if word.startswith('#'): # '#5121' or '# 5121'
+            if word == '#' and i + 1 < len(words):
+                i += 1
+                word += words[i]
+            unit = word.lstrip('#')
+        elif word in UNITS and i + 1 < len(words):
+            i += 1
+            unit = words[i]
+        elif number is None and not canonical and re.fullmatch(r'\d+[a-z]?', word):
+            number = word
+        else:
+            canonical.append(WORDS.get(word, word))
+
+        i += 1
+
+    return number, canonical, unit
+
+def normalize_street(street):
+    '''Canonical '{number} {words}' of a street address, without its unit'''
+
+    number, words, _ = parse_street(street)
+
+    return ' '.join(([number] if number else []) + words)
+
+def address_city(address):
+    '''City of a full address '{street}, {city}, {state} {zip}' or None'''
+
+    parts = address.split(',')
+
+    return parts[1].strip() if len(parts) > 2 else None
+
+def normalize_name(name, city=None):
+    """
+    Canonical form of a business name: store numbers, legal suffixes and a
+    trailing city name are dropped, so 'Chevron Yuma' is 'chevron' when city
+    is 'Yuma'.
+    """
+
+    words = [w for w in tokens(name)
+        if not w.startswith('#') and w not in NAME_NOISE]
+
+    if city:
+        trailing = tokens(city)
+        if len(words) > len(trailing) and words[-len(trailing):] == trailing:
+            del words[-len(trailing):]
+
+    return ' '.join(words)
+
+def trigrams(text):
+    '''Character trigrams of text padded with spaces'''
+
+    padded = ' ' + text + ' '
+
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def dice(a, b):
+    '''Dice coefficient of two sets, 1.0 when both are empty'''
+
+    return 2 * len(a & b) / (len(a) + len(b)) if a or b else 1.0
+
+class AddressIndex:
+    """
+    Token and trigram index of gas stations by name and street, for finding
+    the station a differently written name and address refer to.
+
+        index.add(0, 'Chevron', '1825 S 4th Ave')
+        index.match('Chevron Yuma', '1825 South 4th Avenue, Yuma, AZ 85364')
+        # (0, 1.0)
+
+    Candidates share the house number of the query, or street trigrams when
+    the query has none. They are scored as weight times the street trigram
+    similarity plus the rest times the name's; a name whose words are all
+    in the other name ('Chevron' in 'Chevron Yuma') counts as the same.
+    Stations with different house numbers or directionals ('N Main St' and
+    'S Main St') never match.
+
+    Not thread safe; StationRegistry indexes under its own lock.
+
+    Args:
+        threshold (float, optional): lowest score match() accepts.
+        weight (float, optional): share of the score given to the street.
+    """
+
+    def __init__(self, threshold=0.75, weight=0.6):
+        self.threshold = threshold
+        self.weight = weight
+        self.entries = {} # key: (name words, number, directionals, street,
+                          #       street trigrams)
+        self.by_number = {} # house number: {key}
+        self.by_gram = {} # street trigram: {key}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _parse(self, name, address):
+        number, words, _ = parse_street(address)
+        name = normalize_name(name, address_city(address))
+        street = ' '.join(words)
+        directions = DIRECTIONS.intersection(words)
+
+        return set(name.split()), number, directions, street, trigrams(street)
+
+    def add(self, key, name, address):
+        '''Indexes a station under key, replacing what key had'''
+
+        self.remove(key)
+        entry = self.entries[key] = self._parse(name, address)
+        _, number, _, _, grams = entry
+
+        if number is not None:
+            self.by_number.setdefault(number, set()).add(key)
+        for gram in grams:
+            self.by_gram.setdefault(gram, set()).add(key)
+
+    def remove(self, key):
+        entry = self.entries.pop(key, None)
+
+        if entry is None:
+            return
+
+        _, number, _, _, grams = entry
+        if number is not None:
+            self.by_number[number].discard(key)
+        for gram in grams:
+            self.by_gram[gram].discard(key)
+
+    def score(self, query, entry):
+        '''Similarity of two parsed stations between 0 and 1'''
+
+        q_name, q_number, q_directions, q_street, q_grams = query
+        e_name, e_number, e_directions, e_street, e_grams = entry
+
+        if q_number is not None and e_number is not None and q_number != e_number:
+            return 0.0
+        if q_directions and e_directions and q_directions != e_directions:
+            return 0.0
+
+        street = 1.0 if q_street == e_street else dice(q_grams, e_grams)
+
+        if q_name and e_name and (q_name <= e_name or e_name <= q_name):
+            name = 1.0
+        else:
+            name = dice(trigrams(' '.join(sorted(q_name))),
+                trigrams(' '.join(sorted(e_name))))
+
+        return self.weight * street + (1 - self.weight) * name
+
+    def ranked(self, name, address, n=5):
+        '''Returns the n best (key, score) candidates for a station'''
+
+        query = self._parse(name, address)
+        _, number, _, _, grams = query
+
+        if number is not None and number in self.by_number:
+            keys = self.by_number[number]
+        else:
+            keys = set()
+            for gram in grams:
+                keys |= self.by_gram.get(gram, set())
+
+        scored = [(key, self.score(query, self.entries[key])) for key in keys]
+        scored.sort(key=lambda pair: pair[1], reverse=True)
+
+        return scored[:n]
+
+    def match(self, name, address):
+        '''Returns (key, score) of the best station over threshold, or (None, 0)'''
+
+        best = self.ranked(name, address, 1)
+
+        if best and best[0][1] >= self.threshold:
+            return best[0]
+
+        return None, 0.0
@@ -0,0 +1,130 @@
+# Python 3.7.1 - background writers fed by a bounded queue
+
+from queue import Empty, Queue
+import threading
+from time import perf_counter
+
+STOP = object() # one per writer, queued by close()
+
+class Pipeline:
+    """
+    Bounded queue between the threads that produce items (browsers capturing
+    sidebars) and writer threads that handle them in batches (parsing and
+    persisting), so producers never wait on the disk.
+
+        with Pipeline(write_batch, writers=2) as pipeline:
+            pipeline.put(item)
+
+    Once maxsize items are waiting, put() blocks until a writer catches up:
+    that backpressure keeps memory bounded when the disk is slower than the
+    browsers. drain() and close() return only after every item put before
+    them has been handled.
+
+    Args:
+        handle (callable): called by a writer thread with a list of items.
+        writers (int, optional): writer threads.
+        maxsize (int, optional): items queued before put() blocks.
+        batch_size (int, optional): most items handed to one handle() call;
+            a writer takes whatever is queued up to that, it never waits for
+            a batch to fill.
+    """
+
+    def __init__(self, handle, writers=1, maxsize=256, batch_size=50):
+        self.handle = handle
+        self.batch_size = batch_size
+        self.queue = Queue(maxsize)
+        self.lock = threading.Lock()
+        self.closed = False
+        self.handled = 0
+        self.batches = 0
+        self.errors = 0
+        self.blocked = 0.0 # seconds put() waited on a full queue
+        self.max_depth = 0
+        self.threads = [threading.Thread(target=self.write, daemon=True)
+            for _ in range(writers)]
+
+        for thread in self.threads:
+            thread.start()
+
+    def put(self, item):
+        '''Queues an item, blocking while the queue is full'''
+
+        if self.closed:
+            raise RuntimeError('Pipeline is closed')
+
+        if self.queue.full():
+            started = perf_counter()
+            self.queue.put(item)
+            with self.lock:
+                self.blocked += perf_counter() - started
+        else:
+            self.queue.put(item)
+
+        with self.lock:
+            self.max_depth = max(self.max_depth, self.queue.qsize())
+
+    def write(self):
+        '''Writer thread: hands queued items to self.handle until STOP'''
+
+        stop = False
+
+        while not stop:
+            batch = []
+
+            while len(batch) < self.batch_size:
+                try: # the first item is waited for, the rest only if queued
+                    item = self.queue.get(block=not batch)
+                except Empty:
+                    break
+                if item is STOP: # what is queued after it is another writer's
+                    self.queue.task_done()
+                    stop = True
+                    break
+                batch.append(item)
+
+            if not batch:
+                continue
+
+            try:
+                self.handle(batch)
+            except Exception as e: # a writer that died would block put()
+                print("Pipeline batch of", len(batch), "items failed:", repr(e))
+                with self.lock:
+                    self.errors += 1
+            else:
+                with self.lock:
+                    self.handled += len(batch)
+                    self.batches += 1
+
+            for _ in batch:
+                self.queue.task_done()
+
+    def drain(self):
+        '''Waits until every item put so far is handled, writers keep running'''
+
+        self.queue.join()
+
+    def close(self):
+        '''Stops the writers once everything queued so far is handled'''
+
+        if self.closed:
+            return
+
+        self.closed = True
+
+        for _ in self.threads:
+            self.queue.put(STOP)
+        for thread in self.threads:
+            thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def print_stats(self):
+        print("Pipeline items: " + str(self.handled),
+            "batches: " + str(self.batches), "errors: " + str(self.errors))
+        print("Max queue depth: " + str(self.max_depth),
+            "seconds producers waited: " + str(round(self.blocked, 3)))
@@ -0,0 +1,133 @@
+# Python 3.7.1 - on-disk cache of resolved google maps place urls
+
+from collections import OrderedDict
+from time import time
+import json
+import os
+import threading
+
+from normalize import WORDS, tokens
+
+def cache_key(address):
+    """
+    Normalizes an address so small formatting differences share a key, e.g.
+    'South 4th Avenue' and 'S. 4th Ave'.
+    """
+
+    return ' '.join(WORDS.get(word, word) for word in tokens(address))
+
+class PlaceCache:
+    """
+    Maps a gas station address to the place url and coordinates google maps
+    resolved it to, so later tours can go straight to the url instead of
+    typing the address into the search box.
+
+    Entries expire after ttl seconds and the least recently used entries are
+    dropped once there are more than max_entries. The cache is kept in a json
+    file and written back with save().
+
+    Args:
+        fp (str, optional): json file of the cache.
+        ttl (int, optional): seconds an entry stays valid. Defaults to 30 days.
+        max_entries (int, optional): size bound of the cache.
+        shared (bool, optional): other processes save to fp too, so save()
+            merges what they saved first. The caller keeps two saves from
+            running at once, see workqueue.work().
+    """
+
+    def __init__(self, fp=os.path.join('fuel_prices', '_place_cache.json'),
+        ttl=30*24*3600, max_entries=10000, shared=False):
+        self.fp = fp
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.shared = shared
+        self.lock = threading.Lock() # cache is shared by pooled drivers
+        self.entries = OrderedDict() # key: {url, lat, lon, resolved}, LRU last
+        self.discarded = set() # keys not to merge back from fp
+        self.hits = 0
+        self.misses = 0
+
+        if os.path.isfile(fp):
+            with open(fp) as cache_file:
+                self.entries.update(json.load(cache_file))
+
+    def get(self, address):
+        '''Returns the cached {url, lat, lon, resolved} of address or None'''
+
+        key = cache_key(address)
+
+        with self.lock:
+            entry = self.entries.get(key)
+
+            if entry is not None and time() - entry['resolved'] > self.ttl:
+                del self.entries[key] # expired
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key) # most recently used
+            self.hits += 1
+            return entry
+
+    def put(self, address, url, lat, lon):
+        '''Caches the place url and coordinates address resolved to'''
+
+        key = cache_key(address)
+
+        with self.lock:
+            self.entries[key] = dict(url=url, lat=lat, lon=lon, resolved=time())
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False) # least recently used
+
+    def discard(self, address):
+        '''Drops the entry of address, e.g. when its url stopped working'''
+
+        key = cache_key(address)
+
+        with self.lock:
+            self.entries.pop(key, None)
+            self.discarded.add(key)
+
+    def merge(self):
+        '''Adds the entries saved to self.fp that are newer than ours'''
+
+        if not os.path.isfile(self.fp):
+            return
+
+        with open(self.fp) as cache_file:
+            saved = json.load(cache_file)
+
+        with self.lock:
+            for key, entry in saved.items():
+                ours = self.entries.get(key)
+                if key in self.discarded or \
+                    ours is not None and ours['resolved'] >= entry['resolved']:
+                    continue
+                self.entries[key] = entry
+                if ours is None: # older than anything we used
+                    self.entries.move_to_end(key, last=False)
+
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def save(self):
+        '''Writes the cache to self.fp, merged with it first if self.shared'''
+
+        if self.shared:
+            self.merge()
+
+        folder = os.path.dirname(self.fp)
+        if folder and not os.path.isdir(folder):
+            os.makedirs(folder)
+
+        tmp = '{}.{}.tmp'.format(self.fp, os.getpid()) # workers share fp
+
+        with self.lock:
+            # write to a temp file first so a crash can't corrupt the cache
+            with open(tmp, 'w') as cache_file:
+                json.dump(self.entries, cache_file)
+            os.replace(tmp, self.fp)
@@ -0,0 +1,390 @@
+# Python 3.7.1 - append-only long format price store
+
+from datetime import datetime
+import csv
+import os
+import threading
+
+from records import FUELS, MISSING, format_cents
+
+class PriceStore:
+    """
+    Stores one row per observed price instead of one column per station.
+
+    Rows are buffered in memory and appended in batches to
+    '{fp}/{zipcode}/prices_{YYYY-MM-DD}.csv' (one file per zip code and day)
+    as: timestamp, station, fuel, price. Appending never rewrites what is
+    already on disk, however many stations or days are tracked.
+
+    Args:
+        fp (str, optional): Directory where zipcode folders are stored.
+        batch_size (int, optional): buffered rows that trigger a flush().
+    """
+
+    def __init__(self, fp='fuel_prices', batch_size=500):
+        self.fp = fp
+        self.batch_size = batch_size
+        self.lock = threading.Lock() # add() may be called by pooled drivers
+        self.buffer = {} # csv path: [rows]
+        self.buffered = 0
+
+    def partition(self, zipcode, timestamp):
+        '''Returns the csv path for observations of zipcode at timestamp'''
+
+        day = datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d')
+        return os.path.join(self.fp, zipcode, 'prices_' + day + '.csv')
+
+    def add(self, zipcode, station, timestamp, fuel, price):
+        """
+        Buffers a single price observation.
+
+        Args:
+            zipcode (str): zip code folder the station belongs to.
+            station (str): station name and address.
+            timestamp (float): epoch seconds of the observation.
+            fuel (str): one of FUELS.
+            price (int): price in cents.
+        """
+
+        path = self.partition(zipcode, timestamp)
+
+        with self.lock:
+            self.buffer.setdefault(path, []).append(
+                (int(timestamp), station, fuel, price)
+            )
+            self.buffered += 1
+            full = self.buffered >= self.batch_size
+
+        if full:
+            self.flush()
+
+    def add_prices(self, zipcode, station, prices):
+        '''Buffers the listed fuel prices of a GasPrices instance'''
+
+        for fuel, cents in zip(FUELS, prices.cents()):
+            if cents != MISSING:
+                self.add(zipcode, station, prices.timestamp, fuel, cents)
+
+    def flush(self, replace=()):
+        """
+        Appends the buffered rows to their csv files.
+
+        Args:
+            replace (iterable, optional): (zipcode, timestamp, station) of
+                observations whose stored rows are dropped first, e.g. when
+                parsing their captures again. Every other row is kept.
+        """
+
+        dropped = {} # csv path: {(timestamp, station)}
+        for zipcode, timestamp, station in replace:
+            dropped.setdefault(self.partition(zipcode, timestamp), set()).add(
+                (int(timestamp), station))
+
+        with self.lock:
+            buffer, self.buffer, self.buffered = self.buffer, {}, 0
+
+            for path in set(buffer) | set(dropped):
+                rows = buffer.get(path, [])
+                folder = os.path.dirname(path)
+                if not os.path.isdir(folder):
+                    os.makedirs(folder)
+
+                if path in dropped and os.path.exists(path):
+                    self.rewrite(path, dropped[path], rows)
+                elif rows:
+                    with open(path, 'a', newline='') as csv_file:
+                        csv.writer(csv_file).writerows(rows)
+
+    def rewrite(self, path, dropped, rows):
+        '''Rewrites a csv file without the dropped observations, plus rows'''
+
+        with open(path, newline='') as csv_file:
+            kept = [row for row in csv.reader(csv_file)
+                if (int(row[0]), row[1]) not in dropped]
+
+        with open(path + '.tmp', 'w', newline='') as csv_file:
+            csv.writer(csv_file).writerows(
+                sorted(kept + rows, key=lambda row: int(row[0])))
+        os.replace(path + '.tmp', path)
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def zipcodes(self):
+        '''Returns the zip code folders that hold prices, sorted'''
+
+        if not os.path.isdir(self.fp):
+            return []
+
+        return [name for name in sorted(os.listdir(self.fp))
+            if name.isdigit() and len(name) == 5 and self.files(name)]
+
+    def files(self, zipcode):
+        '''Returns the day partitions of zipcode in date order'''
+
+        folder = os.path.join(self.fp, zipcode)
+        if not os.path.isdir(folder):
+            return []
+
+        return [os.path.join(folder, name) for name in sorted(os.listdir(folder))
+            if name.startswith('prices_') and name.endswith('.csv')]
+
+    def read(self, zipcode, fuel=None, days=None):
+        """
+        Yields the stored observations of zipcode in the order they were
+        written.
+
+        Args:
+            zipcode (str): zip code folder to read.
+            fuel (str, optional): only yield this fuel type.
+            days (int, optional): only read the newest days partitions.
+
+        Yields:
+            tuple: (timestamp, station, fuel, cents)
+        """
+
+        paths = self.files(zipcode)
+        if days is not None:
+            paths = paths[-days:] if days else []
+
+        for path in paths:
+            with open(path, newline='') as csv_file:
+                for timestamp, station, row_fuel, price in csv.reader(csv_file):
+                    if fuel is None or row_fuel == fuel:
+                        yield int(timestamp), station, row_fuel, int(price)
+
+    def wide_view(self, zipcode, fuel):
+        """
+        Rebuilds the one-column-per-station view of a fuel type:
+        timestamp, {station 1}, {station 2}, ...
+
+        Returns:
+            lst: header row followed by one row per timestamp
+        """
+
+        stations = {} # station: column, in order of appearance
+        rows = {} # timestamp: {column: price}
+
+        for timestamp, station, _, price in self.read(zipcode, fuel):
+            column = stations.setdefault(station, len(stations))
+            rows.setdefault(timestamp, {})[column] = format_cents(price)
+
+        table = [['timestamp'] + list(stations)]
+        for timestamp in sorted(rows):
+            prices = rows[timestamp]
+            table.append([datetime.fromtimestamp(timestamp).ctime()] +
+                [prices.get(column, '') for column in range(len(stations))])
+
+        return table
+
+    def export_wide(self, zipcode):
+        '''Writes the wide view to '{fp}/{zipcode}/{fuel}.csv' for every fuel'''
+
+        for fuel in FUELS:
+            path = os.path.join(self.fp, zipcode, fuel + '.csv')
+            with open(path, 'w', newline='') as csv_file:
+                csv.writer(csv_file).writerows(self.wide_view(zipcode, fuel))
+
+class PriceHistory:
+    """
+    Change-only price history: a station's prices are only written when they
+    differ from the last known prices, so disk use grows with the number of
+    price changes rather than with how often stations are scraped.
+
+    Rows are appended to '{fp}/{zipcode}/history.csv' as either
+        C, timestamp, station, diesel, regular, midgrade, premium
+    with each price stored as the change in cents from the previous C row of
+    the station (its first row holds the prices themselves), or
+        H, timestamp, station, count
+    a heartbeat saying the prices were seen unchanged count more times,
+    written at least every heartbeat seconds to show the station is alive.
+
+    Args:
+        fp (str, optional): Directory where zipcode folders are stored.
+        heartbeat (int, optional): max seconds between rows of a station.
+        batch_size (int, optional): buffered rows that trigger a flush().
+    """
+
+    def __init__(self, fp='fuel_prices', heartbeat=6*3600, batch_size=100):
+        self.fp = fp
+        self.heartbeat = heartbeat
+        self.batch_size = batch_size
+        self.lock = threading.Lock()
+        # station: [cents tuple, timestamp written, unwritten observations,
+        #           timestamp last seen, csv path]
+        self.last = {}
+        self.loaded = set() # zip codes whose last prices were read from disk
+        self.buffer = {} # csv path: [rows]
+        self.buffered = 0
+
+    def path(self, zipcode):
+        return os.path.join(self.fp, zipcode, 'history.csv')
+
+    def _load(self, zipcode):
+        '''Reads the last known prices of a zip code's stations from disk'''
+
+        path = self.path(zipcode)
+
+        for timestamp, station, cents, _ in self.read(zipcode):
+            self.last[station] = [cents, timestamp, 0, timestamp, path]
+
+        self.loaded.add(zipcode)
+
+    def record(self, zipcode, station, prices):
+        """
+        Records an observation, writing it only if it is a change or a
+        heartbeat is due. Unchanged observations not written yet go into an
+        H row just before the next C row, or at close().
+
+        Args:
+            zipcode (str): zip code folder the station belongs to.
+            station (str): station name and address.
+            prices (GasPrices): scraped prices.
+
+        Returns:
+            bool: True if a row was written
+        """
+
+        cents = prices.cents()
+        path = self.path(zipcode)
+
+        with self.lock:
+            if zipcode not in self.loaded:
+                self._load(zipcode)
+
+            last = self.last.get(station)
+            rows = []
+
+            if last is None or last[0] != cents:
+                previous = last[0] if last else (0, 0, 0, 0)
+                if last is not None and last[2]: # the unchanged ones before
+                    rows.append(['H', last[3], station, last[2]])
+                rows.append(['C', prices.timestamp, station] +
+                    [new - old for new, old in zip(cents, previous)])
+                self.last[station] = [cents, prices.timestamp, 0,
+                    prices.timestamp, path]
+
+            elif prices.timestamp - last[1] >= self.heartbeat:
+                rows.append(['H', prices.timestamp, station, last[2] + 1])
+                last[1:4] = [prices.timestamp, 0, prices.timestamp]
+
+            else:
+                last[2] += 1 # seen unchanged; counted in the next heartbeat
+                last[3] = prices.timestamp
+                return False
+
+            self.buffer.setdefault(path, []).extend(rows)
+            self.buffered += len(rows)
+            full = self.buffered >= self.batch_size
+
+        if full:
+            self.flush()
+
+        return True
+
+    def flush(self):
+        '''Appends the buffered rows to the history files'''
+
+        with self.lock:
+            buffer, self.buffer, self.buffered = self.buffer, {}, 0
+
+            for path, rows in buffer.items():
+                folder = os.path.dirname(path)
+                if not os.path.isdir(folder):
+                    os.makedirs(folder)
+
+                with open(path, 'a', newline='') as csv_file:
+                    csv.writer(csv_file).writerows(rows)
+
+    def close(self):
+        '''Writes the unchanged observations no row counts yet, and flushes'''
+
+        with self.lock:
+            for station, last in self.last.items():
+                if last[2]:
+                    self.buffer.setdefault(last[4], []).append(
+                        ['H', last[3], station, last[2]])
+                    self.buffered += 1
+                    last[1:4] = [last[3], 0, last[3]]
+
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def read(self, zipcode, station=None):
+        """
+        Decodes the history of a zip code.
+
+        Args:
+            zipcode (str): zip code folder to read.
+            station (str, optional): only yield this station.
+
+        Yields:
+            tuple: (timestamp, station, cents tuple, observations) for every
+                stored row; observations is how many scrapes the row stands for
+        """
+
+        path = self.path(zipcode)
+        if not os.path.isfile(path):
+            return
+
+        prices = {} # station: cents tuple so far
+
+        with open(path, newline='') as csv_file:
+            for row in csv.reader(csv_file):
+                kind, timestamp, name = row[0], int(row[1]), row[2]
+
+                if kind == 'C':
+                    previous = prices.get(name, (0, 0, 0, 0))
+                    prices[name] = tuple(
+                        old + int(delta) for old, delta in zip(previous, row[3:])
+                    )
+                    count = 1
+                else:
+                    count = int(row[3])
+
+                if station is None or name == station:
+                    yield timestamp, name, prices[name], count
+
+    def series(self, zipcode, station, step, start=None, end=None):
+        """
+        Expands a station's history back into a regular series, carrying
+        each price forward until the next change.
+
+        Args:
+            zipcode (str): zip code folder to read.
+            station (str): station name and address.
+            step (int): seconds between points.
+            start (int, optional): first timestamp, defaults to the first row.
+            end (int, optional): last timestamp, defaults to the last row.
+
+        Returns:
+            lst: (timestamp, cents tuple) points
+        """
+
+        rows = [(t, cents) for t, _, cents, _ in self.read(zipcode, station)]
+        if not rows:
+            return []
+
+        start = rows[0][0] if start is None else start
+        end = rows[-1][0] if end is None else end
+        points = []
+        i = -1
+
+        for timestamp in range(start, end + 1, step):
+            while i + 1 < len(rows) and rows[i + 1][0] <= timestamp:
+                i += 1
+            if i >= 0:
+                points.append((timestamp, rows[i][1]))
+
+        return points
@@ -0,0 +1,165 @@
+# Python 3.7.1 - compact record types for scraped stations and prices
+
+from array import array
+from time import ctime, time
+
+FUELS = ['diesel', 'regular', 'midgrade', 'premium']
+MISSING = -1 # cents value of a price google maps did not list
+
+def to_cents(price):
+    """
+    Converts a scraped price to integer cents.
+
+    Args:
+        price (str or int): '$3.30', '3.30', '-' or cents already.
+
+    Returns:
+        int: cents, or MISSING for placeholders such as '-'
+    """
+
+    if isinstance(price, int):
+        return price
+
+    try:
+        return int(round(float(price.strip('$')) * 100))
+    except (AttributeError, ValueError):
+        return MISSING
+
+def format_cents(cents):
+    '''Formats cents as the dollar string google maps shows, '-' if MISSING'''
+
+    if cents == MISSING:
+        return '-'
+
+    return '{}.{:02d}'.format(*divmod(cents, 100))
+
+# labels the prices container may list a grade under, lower cased
+LABELS = dict(
+    diesel='diesel', regular='regular', unleaded='regular', midgrade='midgrade',
+    plus='midgrade', premium='premium', super='premium', supreme='premium',
+)
+LABELS['mid-grade'] = 'midgrade'
+
+def parse_fixed(text, timestamp=None):
+    """
+    Parses a raw 'section-gas-prices-container' text by position: the tokens
+    with a '$' or '-' are taken as diesel, regular, midgrade and premium in
+    that order, as in prices_sample.txt.
+
+    Returns:
+        GasPrices: prices scraped at timestamp (now if None)
+    """
+
+    prices = [i.strip('$') for i in text.split() if '$' in i or '-' in i]
+    prices += [MISSING] * (len(FUELS) - len(prices)) # grades not listed
+
+    return GasPrices(*prices[:len(FUELS)], timestamp=timestamp)
+
+def parse_labeled(text, timestamp=None):
+    """
+    Parses a raw 'section-gas-prices-container' text by its labels: each
+    price goes to the grade named on the line before it, so reordered,
+    missing or unknown grades (e.g. 'E85') cannot shift the others.
+
+    Returns:
+        GasPrices: prices scraped at timestamp (now if None)
+    """
+
+    prices = dict.fromkeys(FUELS, MISSING)
+    fuel = None # grade the next price belongs to
+
+    for line in text.splitlines():
+        line = line.strip()
+        label = line.lower().rstrip(':')
+
+        if label in LABELS:
+            fuel = LABELS[label]
+        elif line.startswith('$') or line.strip('-') == '':
+            if fuel is not None and line and prices[fuel] == MISSING:
+                prices[fuel] = to_cents(line)
+            fuel = None
+        else: # a grade this parser does not track
+            fuel = None
+
+    return GasPrices(*(prices[fuel] for fuel in FUELS), timestamp=timestamp)
+
+PARSERS = dict(fixed=parse_fixed, labels=parse_labeled)
+
+class GeoInfo:
+    '''Stores geographical data about a location visisted on google maps'''
+
+    __slots__ = ('lat', 'lon')
+
+    def __init__(self, x, y):
+        self.lat = float(x)
+        self.lon = float(y)
+
+class GasPrices:
+    """
+    Stores fuel prices as scraped from google maps.
+
+    Prices are kept as integer cents (MISSING when not listed) and the
+    timestamp as integer epoch seconds.
+    """
+
+    __slots__ = ('diesel', 'regular', 'midgrade', 'premium', 'timestamp')
+
+    def __init__(self, diesel, reg, mid, premium, timestamp=None):
+        self.diesel = to_cents(diesel)
+        self.regular = to_cents(reg)
+        self.midgrade = to_cents(mid)
+        self.premium = to_cents(premium)
+        # epoch seconds; local time with ctime()
+        self.timestamp = int(time()) if timestamp is None else int(timestamp)
+
+    def ctime(self):
+        '''Returns the timestamp as a local time string'''
+
+        return ctime(self.timestamp)
+
+    def cents(self):
+        '''Returns the prices as a tuple in FUELS order'''
+
+        return (self.diesel, self.regular, self.midgrade, self.premium)
+
+class GasStation:
+    '''Stores information for gas station results as they are being scraped'''
+
+    __slots__ = ('name', 'st_ad', 'address', 'url', 'lat', 'lon', 'has_prices')
+
+    def __init__(self, name=None, st_ad=None):
+        self.name = name
+        self.st_ad = st_ad # street address as listed in the results
+        self.address = None # full address from the place page
+        self.url = None # place url, once known
+        self.lat = None
+        self.lon = None
+        self.has_prices = True # default; will change while scraping if True
+
+def parse_price_columns(texts, timestamps=None):
+    """
+    Parses many raw 'section-gas-prices-container' texts in one pass into
+    columns of integer cents, one array per fuel type.
+
+    Args:
+        texts (iterable): raw prices texts, e.g. the one in prices_sample.txt
+        timestamps (iterable, optional): epoch seconds of each text.
+
+    Returns:
+        dict: {fuel: array('i')} plus 'timestamp': array('q') if timestamps
+    """
+
+    columns = {fuel: array('i') for fuel in FUELS}
+    appends = [columns[fuel].append for fuel in FUELS]
+
+    for text in texts:
+        tokens = [i for i in text.split() if '$' in i or '-' in i]
+        tokens += [MISSING] * (len(FUELS) - len(tokens))
+
+        for append, token in zip(appends, tokens):
+            append(to_cents(token))
+
+    if timestamps is not None:
+        columns['timestamp'] = array('q', (int(t) for t in timestamps))
+
+    return columns
@@ -0,0 +1,268 @@
+# Python 3.7.1 - global gas station registry shared by every zip code
+
+import hashlib
+import json
+import os
+import threading
+
+from normalize import AddressIndex, address_city, normalize_name, normalize_street
+
+def split_address(line):
+    """
+    Splits a station line into its name, street and full address.
+
+    Both forms of station lines are read:
+
+    - 'gas_stations.txt': '{name} {street}, {city}, {state} {zipcode}'. The
+      street is assumed to start at the first number of two or more digits,
+      e.g. 'Good 2 Go 1600 S Avenue B #5121, Yuma, AZ 85364'.
+    - '_gas_stations_{zipcode}.txt', see helpfuncs.gas_station_line():
+      '{name}, {street}, {city}, {state} {zipcode}', told apart by a first
+      part without such a number and a second part that starts with one.
+
+        >>> split_address('Chevron 1825 S 4th Ave, Yuma, AZ 85364')
+        ('Chevron', '1825 S 4th Ave', '1825 S 4th Ave, Yuma, AZ 85364')
+        >>> split_address('Chevron, 1825 S 4th Ave, Yuma, AZ 85364')
+        ('Chevron', '1825 S 4th Ave', '1825 S 4th Ave, Yuma, AZ 85364')
+
+    Args:
+        line (str): station line in either form.
+
+    Returns:
+        tuple: (name, street, address)
+    """
+
+    first, _, rest = line.partition(',')
+    words = first.split()
+    number = [i for i, word in enumerate(words)
+        if i and word.isdigit() and len(word) > 1]
+
+    street = rest.split(',')[0].strip()
+    if not number and rest.count(',') >= 2 and street[:1].isdigit():
+        return first.strip(), street, rest.strip()
+
+    i = number[0] if number else len(words) - 1
+
+    name = ' '.join(words[:i]).rstrip(',')
+    street = ' '.join(words[i:])
+    address = street + (',' + rest if rest else '')
+
+    return name, street, address
+
+def station_key(name, address):
+    """
+    Returns the dedup key of a station: its normalized name and street.
+
+    Only the street part of address (before the first comma) is used, so a
+    results page row ('1825 S 4th Ave') and a full address
+    ('1825 South 4th Avenue, Yuma, AZ 85364') give the same key. See
+    normalize.normalize_street() and normalize_name().
+    """
+
+    return normalize_name(name, address_city(address)) + '|' + \
+        normalize_street(address)
+
+def station_id(name, address):
+    '''Id a new station gets: a short hash of its station_key()'''
+
+    return hashlib.sha1(station_key(name, address).encode()).hexdigest()[:12]
+
+def geo_key(lat, lon, places=4):
+    '''Rounds coordinates to ~10 meter cells; one station per cell'''
+
+    return round(lat, places), round(lon, places)
+
+class StationRegistry:
+    """
+    Every gas station seen by any zip code or results page, indexed by
+    station_key() and by geo_key() so duplicates are found in O(1). Names and
+    addresses written differently enough to get another key are matched by
+    self.index, a normalize.AddressIndex.
+
+    Stations are also marked as they are handed out during a tour (see
+    first_sighting()), so a station listed by several zip codes or result
+    pages is only scraped once per tour.
+
+    Args:
+        fp (str, optional): json file of the registry, None to keep it in
+            memory only.
+        shared (bool, optional): other processes save to fp too, so save()
+            merges what they saved first. The caller keeps two saves from
+            running at once, see workqueue.work().
+    """
+
+    def __init__(self, fp=os.path.join('fuel_prices', '_stations.json'),
+        shared=False):
+        self.fp = fp
+        self.shared = shared
+        self.lock = threading.Lock() # shared by concurrent scrapers
+        self.stations = {} # id: {id, name, address, lat, lon, zipcodes, prices}
+        self.by_key = {} # station_key: id
+        self.by_geo = {} # geo_key: id
+        self.index = AddressIndex() # fuzzy name and street matches
+        self.sighted = set() # ids handed out this tour
+        self.spatial = None # spatial.StationIndex kept up to date, if any
+
+        if fp is not None and os.path.isfile(fp):
+            with open(fp) as registry_file:
+                for station in json.load(registry_file):
+                    self._index(station)
+
+    def __len__(self):
+        return len(self.stations)
+
+    def __contains__(self, station_id):
+        return station_id in self.stations
+
+    def _index(self, station):
+        self.stations[station['id']] = station
+        self.by_key[station_key(station['name'], station['address'])] = \
+            station['id']
+
+        self.index.add(station['id'], station['name'], station['address'])
+
+        if station['lat'] is not None:
+            self.by_geo[geo_key(station['lat'], station['lon'])] = station['id']
+
+    def _find(self, key, name, address, lat, lon):
+        '''Id of the station by key, coordinates or a fuzzy match, or None'''
+
+        station_id = self.by_key.get(key)
+
+        if station_id is None and lat is not None:
+            station_id = self.by_geo.get(geo_key(lat, lon))
+
+        if station_id is None:
+            station_id, _ = self.index.match(name, address)
+
+        return station_id
+
+    def lookup(self, name, address, lat=None, lon=None):
+        '''Returns the id of a known station or None'''
+
+        with self.lock:
+            return self._find(station_key(name, address), name, address, lat, lon)
+
+    def register(self, name, address, lat=None, lon=None, zipcode=None):
+        """
+        Adds a station, or updates the one it duplicates, and returns its id.
+
+        Args:
+            name (str): business name.
+            address (str): street or full address.
+            lat (float, optional): latitude once known.
+            lon (float, optional): longitude once known.
+            zipcode (str, optional): zip code whose results listed it.
+
+        Returns:
+            str: station id
+        """
+
+        key = station_key(name, address)
+
+        with self.lock:
+            found = self._find(key, name, address, lat, lon)
+
+            if found is None:
+                station = dict(id=station_id(name, address), name=name,
+                    address=address, lat=None, lon=None, zipcodes=[])
+            else:
+                station = self.stations[found]
+
+            # keep the most complete address and the newest coordinates
+            if len(address) > len(station['address']):
+                station['address'] = address
+            if lat is not None:
+                station['lat'], station['lon'] = lat, lon
+            if zipcode is not None and zipcode not in station['zipcodes']:
+                station['zipcodes'].append(zipcode)
+
+            self._index(station)
+            self.by_key[key] = station['id'] # also index the name it came with
+
+            if lat is not None and self.spatial is not None:
+                self.spatial.insert(station['id'], lat, lon)
+
+            return station['id']
+
+    def update_prices(self, station_id, prices):
+        '''Keeps the latest GasPrices of a station, for StationIndex queries'''
+
+        with self.lock:
+            station = self.stations[station_id]
+            station['prices'] = list(prices.cents())
+            station['checked'] = prices.timestamp
+
+            if self.spatial is not None:
+                self.spatial.set_prices(station_id, station['prices'])
+
+    def start_tour(self):
+        '''Forgets which stations were handed out during the last tour'''
+
+        with self.lock:
+            self.sighted.clear()
+
+    def first_sighting(self, station_id):
+        '''True the first time station_id is seen in the current tour'''
+
+        with self.lock:
+            if station_id in self.sighted:
+                return False
+
+            self.sighted.add(station_id)
+            return True
+
+    def merge(self):
+        """
+        Adds the stations saved to self.fp that we do not know, and the
+        zip codes, coordinates and newer prices saved for the ones we do.
+        """
+
+        if self.fp is None or not os.path.isfile(self.fp):
+            return
+
+        with open(self.fp) as registry_file:
+            saved = json.load(registry_file)
+
+        with self.lock:
+            for station in saved:
+                ours = self.stations.get(station['id'])
+
+                if ours is None:
+                    self._index(station)
+                else:
+                    ours['zipcodes'] += [zipcode for zipcode in
+                        station['zipcodes'] if zipcode not in ours['zipcodes']]
+                    if ours['lat'] is None and station['lat'] is not None:
+                        ours['lat'], ours['lon'] = station['lat'], station['lon']
+                        self._index(ours)
+                    if station.get('checked', 0) > ours.get('checked', 0):
+                        ours['prices'] = station['prices']
+                        ours['checked'] = station['checked']
+                    station = ours
+
+                if self.spatial is not None and station['lat'] is not None:
+                    self.spatial.insert(station['id'], station['lat'],
+                        station['lon'])
+                    if station.get('prices') is not None:
+                        self.spatial.set_prices(station['id'], station['prices'])
+
+    def save(self):
+        '''Writes the registry to self.fp, merged with it first if self.shared'''
+
+        if self.fp is None:
+            return
+
+        if self.shared:
+            self.merge()
+
+        folder = os.path.dirname(self.fp)
+        if folder and not os.path.isdir(folder):
+            os.makedirs(folder)
+
+        tmp = '{}.{}.tmp'.format(self.fp, os.getpid()) # workers share fp
+
+        with self.lock:
+            with open(tmp, 'w') as registry_file:
+                json.dump(list(self.stations.values()), registry_file, indent=1)
+            os.replace(tmp, self.fp)
@@ -0,0 +1,261 @@
+# Python 3.7.1 - staleness driven scheduler that keeps re-checking stations
+
+import argparse
+import heapq
+import json
+import os
+import threading
+from time import time
+
+from selenium.common.exceptions import WebDriverException
+
+from helpfuncs import GasPriceChecker
+from metrics import Metrics
+from placecache import PlaceCache
+from pricestore import PriceHistory, PriceStore
+from registry import StationRegistry
+
+class StationSchedule:
+    """
+    Priority queue of stations ordered by when they are next due.
+
+    Every station has its own check interval: it is halved (down to
+    min_interval) when a visit finds a price change and grown by half (up to
+    max_interval) when nothing changed, so volatile stations get checked
+    more often than static ones.
+
+    Args:
+        min_interval (int, optional): shortest seconds between visits.
+        max_interval (int, optional): longest seconds between visits.
+        interval (int, optional): starting interval of new stations.
+        fp (str, optional): json file to keep intervals between runs.
+    """
+
+    def __init__(self, min_interval=15*60, max_interval=12*3600,
+        interval=3600, fp=None):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = interval
+        self.fp = fp
+        self.cond = threading.Condition()
+        self.heap = [] # (due, seq, address)
+        self.seq = 0 # breaks ties between stations due at the same time
+        self.state = {} # address: {interval, due, prices, checks, changes}
+
+        if fp is not None and os.path.isfile(fp):
+            with open(fp) as schedule_file:
+                self.state = json.load(schedule_file)
+
+    def __len__(self):
+        return len(self.state)
+
+    def _push(self, address, due):
+        self.state[address]['due'] = due
+        heapq.heappush(self.heap, (due, self.seq, address))
+        self.seq += 1
+        self.cond.notify()
+
+    def add(self, address, due=None):
+        '''Schedules a station; known stations keep their saved due time'''
+
+        with self.cond:
+            if address not in self.state:
+                self.state[address] = dict(interval=self.interval,
+                    due=time() if due is None else due,
+                    prices=None, checks=0, changes=0)
+            self._push(address, self.state[address]['due'])
+
+    def take(self, stop):
+        """
+        Blocks until a station is due and returns it, or returns None once
+        stop (threading.Event) is set.
+        """
+
+        with self.cond:
+            while not stop.is_set():
+                now = time()
+                if self.heap and self.heap[0][0] <= now:
+                    return heapq.heappop(self.heap)[2]
+
+                wait = self.heap[0][0] - now if self.heap else 1.0
+                self.cond.wait(min(wait, 1.0)) # wake up to check stop
+
+    def done(self, address, prices):
+        """
+        Reschedules a station after a successful visit.
+
+        Args:
+            address (str): station that was visited.
+            prices (GasPrices): prices found.
+
+        Returns:
+            bool: True if the prices changed since the last visit
+        """
+
+        with self.cond:
+            entry = self.state[address]
+            cents = list(prices.cents())
+            changed = entry['prices'] is not None and entry['prices'] != cents
+
+            if changed:
+                entry['interval'] = max(self.min_interval, entry['interval'] / 2)
+                entry['changes'] += 1
+            elif entry['prices'] is not None:
+                entry['interval'] = min(self.max_interval, entry['interval'] * 1.5)
+
+            entry['prices'] = cents
+            entry['checks'] += 1
+            self._push(address, time() + entry['interval'])
+
+            return changed
+
+    def failed(self, address):
+        '''Reschedules a station whose visit failed, min_interval from now'''
+
+        with self.cond:
+            self._push(address, time() + self.min_interval)
+
+    def save(self):
+        '''Writes the intervals and last prices to self.fp'''
+
+        if self.fp is None:
+            return
+
+        folder = os.path.dirname(self.fp)
+        if folder and not os.path.isdir(folder):
+            os.makedirs(folder)
+
+        with self.cond:
+            with open(self.fp + '.tmp', 'w') as schedule_file:
+                json.dump(self.state, schedule_file)
+            os.replace(self.fp + '.tmp', self.fp)
+
+class Scheduler:
+    """
+    Long running mode of GasPriceChecker: a fixed pool of workers keeps
+    visiting whichever station is due next in a StationSchedule, on drivers
+    borrowed from checker.sessions.
+
+    Args:
+        checker (GasPriceChecker): its addresses, driver settings and store
+            are used for every visit.
+        schedule (StationSchedule): when each station is due.
+        workers (int, optional): number of drivers.
+        save_every (int, optional): visits between schedule saves.
+    """
+
+    def __init__(self, checker, schedule, workers=2, save_every=50):
+        self.checker = checker
+        self.schedule = schedule
+        self.workers = workers
+        self.save_every = save_every
+        self.stop = threading.Event()
+        self.visits = 0
+        self.lock = threading.Lock()
+
+    def worker(self, max_window, dims):
+        '''Visits due stations on warm drivers until self.stop is set'''
+
+        checker = self.checker
+
+        while True:
+            loc = self.schedule.take(self.stop)
+            if loc is None:
+                break
+
+            # drivers are recycled by checker.sessions as they wear out
+            try:
+                result = checker.session_visit(loc, max_window, dims)
+                if result is not None:
+                    checker.persist(loc, result[1])
+            except WebDriverException as e: # the browser died; it is retired
+                print(loc, "lost its browser:", e.msg)
+                result = None
+            except Exception as e: # a dead worker would shrink the pool
+                print(loc, "failed:", repr(e))
+                result = None
+
+            if result is None:
+                self.schedule.failed(loc)
+                continue
+
+            if self.schedule.done(loc, result[1]):
+                print(loc, "price changed.")
+
+            with self.lock:
+                self.visits += 1
+                save = self.visits % self.save_every == 0
+
+            if save:
+                try:
+                    self.save()
+                except Exception as e:
+                    print("Saving the schedule failed:", repr(e))
+
+    def save(self):
+        self.schedule.save()
+        self.checker.flush()
+        self.checker.metrics.export()
+
+    def run(self, duration=None, max_window=False, dims=(1080,800)):
+        """
+        Schedules every address of the checker and runs the workers until
+        duration seconds have passed, stop is set or Ctrl+C is pressed.
+        """
+
+        for loc in self.checker.tour_locations():
+            self.schedule.add(loc)
+
+        threads = [
+            threading.Thread(target=self.worker, args=(max_window, dims))
+            for _ in range(self.workers)
+        ]
+        for thread in threads:
+            thread.start()
+
+        try:
+            self.stop.wait(duration)
+        except KeyboardInterrupt:
+            print("Stopping scheduler.")
+        finally:
+            self.stop.set()
+            for thread in threads:
+                thread.join()
+            self.save()
+            self.checker.sessions.close()
+
+        self.checker.sessions.print_stats()
+        print("Scheduler stopped after", self.visits, "visits.")
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Keeps re-checking gas stations, most volatile first'
+    )
+    parser.add_argument('addresses', help='text file with an address per line')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--min-interval', type=int, default=15*60)
+    parser.add_argument('--max-interval', type=int, default=12*3600)
+    parser.add_argument('--schedule', default=os.path.join(
+        'fuel_prices', '_schedule.json'), help='json file of the schedule')
+    parser.add_argument('--duration', type=float,
+        help='seconds to run, forever by default')
+    parser.add_argument('--metrics', metavar='PATH',
+        help='write stage timings and station counts to PATH.prom and '
+        'PATH.json')
+    args = parser.parse_args()
+
+    schedule = StationSchedule(
+        args.min_interval, args.max_interval, fp=args.schedule
+    )
+
+    with PriceStore() as store, PriceHistory() as history:
+        checker = GasPriceChecker(
+            'https://www.google.com/maps', GasPriceChecker.xpaths,
+            args.addresses, store=store, history=history,
+            place_cache=PlaceCache(), registry=StationRegistry(),
+            metrics=Metrics(args.metrics) if args.metrics else None
+        )
+        Scheduler(checker, schedule, args.workers).run(args.duration)
+
+if __name__ == '__main__':
+    main()
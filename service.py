@@ -0,0 +1,125 @@
+# Python 3.7.1 - local http service answering price queries from memory
+
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+import threading
+from urllib.parse import parse_qs, urlparse
+
+from latest import LatestPrices
+from pricestore import PriceStore
+from records import FUELS
+from registry import StationRegistry
+
+class PriceHandler(BaseHTTPRequestHandler):
+    """
+    GET /zip/{zipcode}, /station/{id} and /cheapest?fuel=regular&n=10&zip=
+    as json, from the server's LatestPrices.
+    """
+
+    protocol_version = 'HTTP/1.1' # keep-alive, see send()
+    # one write per response, flushed after do_GET(): with separate header
+    # and body writes nagle holds the body back for the client's delayed ack
+    wbufsize = -1
+
+    def send(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        prices = self.server.prices
+        url = urlparse(self.path)
+        parts = url.path.strip('/').split('/')
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+
+        if len(parts) == 2 and parts[0] == 'zip':
+            self.send(200, prices.zip(parts[1]))
+
+        elif len(parts) == 2 and parts[0] == 'station':
+            entry = prices.station(parts[1])
+            if entry is None:
+                self.send(404, dict(error='unknown station ' + parts[1]))
+            else:
+                self.send(200, entry)
+
+        elif parts == ['cheapest']:
+            fuel = query.get('fuel', 'regular')
+            if fuel not in FUELS:
+                self.send(400, dict(error='fuel must be one of ' + ', '.join(FUELS)))
+                return
+            try:
+                n = int(query.get('n', 10))
+            except ValueError:
+                self.send(400, dict(error='n must be a number'))
+                return
+            self.send(200, prices.cheapest(fuel, n, query.get('zip')))
+
+        else:
+            self.send(404, dict(error='not found'))
+
+    def log_message(self, format, *args):
+        pass # one line per request would cost more than the lookup
+
+def serve(prices, host='127.0.0.1', port=8000):
+    """
+    Returns an http server for prices bound to host:port; requests are
+    answered once serve_forever() is called on it.
+    """
+
+    server = ThreadingHTTPServer((host, port), PriceHandler)
+    server.daemon_threads = True
+    server.prices = prices
+
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Answers price queries over http from an in-memory cache'
+    )
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--fp', default='fuel_prices',
+        help='directory of the zip code folders')
+    parser.add_argument('--capacity', type=int, default=10000,
+        help='stations kept in memory')
+    parser.add_argument('--addresses',
+        help='also keep checking the stations of this address file')
+    parser.add_argument('--workers', type=int, default=2)
+    args = parser.parse_args()
+
+    registry = StationRegistry(os.path.join(args.fp, '_stations.json'))
+    prices = LatestPrices(PriceStore(args.fp), registry, args.capacity)
+    server = serve(prices, args.host, args.port)
+
+    if args.addresses is not None: # tours feed the cache as they go
+        from helpfuncs import GasPriceChecker # only tours need selenium
+        from scheduler import Scheduler, StationSchedule
+
+        checker = GasPriceChecker(
+            'https://www.google.com/maps', GasPriceChecker.xpaths,
+            args.addresses, store=prices.store, registry=registry,
+            latest=prices
+        )
+        scheduler = Scheduler(checker, StationSchedule(), args.workers)
+        tours = threading.Thread(target=scheduler.run)
+        tours.start()
+
+    print("Serving on http://{}:{}".format(*server.server_address))
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Stopping server.")
+    finally:
+        server.server_close()
+        if args.addresses is not None:
+            scheduler.stop.set()
+            tours.join() # flushes the store
+
+if __name__ == '__main__':
+    main()
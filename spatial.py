@@ -0,0 +1,274 @@
+# Python 3.7.1 - grid index of station coordinates for nearby/cheapest queries
+
+import heapq
+import math
+import threading
+
+from records import FUELS, MISSING
+
+EARTH_RADIUS_MILES = 3958.8
+MILES_PER_DEGREE = 69.05 # of latitude, and of longitude at the equator
+
+def haversine_miles(lat1, lon1, lat2, lon2):
+    '''Great circle distance in miles between two coordinates'''
+
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + \
+        math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+
+    return 2 * EARTH_RADIUS_MILES * math.asin(math.sqrt(min(1.0, a)))
+
+class StationIndex:
+    """
+    Uniform grid over station coordinates, so nearby stations are found by
+    looking at a few cells instead of every station.
+
+    Stations are keyed by their StationRegistry id and can be added, moved or
+    given new prices at any time. Coordinates are assumed not to cross the
+    antimeridian, which holds for every zip code google maps lists prices in.
+
+    Args:
+        cell (float, optional): cell size in degrees; 0.05 is ~3.5 miles.
+    """
+
+    def __init__(self, cell=0.05):
+        self.cell = cell
+        self.lock = threading.RLock()
+        self.cells = {} # (row, col): set of station ids
+        self.points = {} # station id: (lat, lon)
+        self.prices = {} # station id: cents tuple in FUELS order
+        self.bounds = None # [first row, last row, first col, last col] ever used
+
+    def __len__(self):
+        return len(self.points)
+
+    def __contains__(self, station_id):
+        return station_id in self.points
+
+    @classmethod
+    def from_registry(cls, registry, cell=0.05):
+        """
+        Indexes every station of a StationRegistry that has coordinates and
+        keeps the index up to date as the registry learns new ones.
+        """
+
+        index = cls(cell)
+
+        with registry.lock:
+            for station in registry.stations.values():
+                if station['lat'] is not None:
+                    index.insert(station['id'], station['lat'], station['lon'])
+                if station.get('prices') is not None:
+                    index.set_prices(station['id'], station['prices'])
+
+            registry.spatial = index
+
+        return index
+
+    def _cell(self, lat, lon):
+        return int(math.floor(lat / self.cell)), int(math.floor(lon / self.cell))
+
+    def insert(self, station_id, lat, lon):
+        '''Adds a station, or moves it if it was already indexed'''
+
+        with self.lock:
+            self.remove(station_id)
+            self.points[station_id] = (lat, lon)
+            row, col = self._cell(lat, lon)
+            self.cells.setdefault((row, col), set()).add(station_id)
+
+            if self.bounds is None:
+                self.bounds = [row, row, col, col]
+            else:
+                bounds = self.bounds
+                bounds[:] = [min(bounds[0], row), max(bounds[1], row),
+                    min(bounds[2], col), max(bounds[3], col)]
+
+    def remove(self, station_id):
+        with self.lock:
+            point = self.points.pop(station_id, None)
+            if point is None:
+                return
+
+            key = self._cell(*point)
+            self.cells[key].discard(station_id)
+            if not self.cells[key]:
+                del self.cells[key]
+
+    def set_prices(self, station_id, cents):
+        '''Stores the latest prices of a station, in FUELS order'''
+
+        with self.lock:
+            self.prices[station_id] = tuple(cents)
+
+    def _cells_in(self, south, west, north, east):
+        '''Ids in the cells overlapping a box, whichever way is cheaper'''
+
+        (row0, col0), (row1, col1) = self._cell(south, west), self._cell(north, east)
+
+        if (row1 - row0 + 1) * (col1 - col0 + 1) > len(self.cells):
+            cells = (ids for (row, col), ids in self.cells.items()
+                if row0 <= row <= row1 and col0 <= col <= col1)
+        else:
+            cells = (self.cells.get((row, col), ())
+                for row in range(row0, row1 + 1)
+                for col in range(col0, col1 + 1))
+
+        for ids in cells:
+            yield from ids
+
+    def bbox(self, south, west, north, east):
+        '''Returns the ids of the stations inside a lat/lon box'''
+
+        with self.lock:
+            points = self.points
+            return [i for i in self._cells_in(south, west, north, east)
+                if south <= points[i][0] <= north and west <= points[i][1] <= east]
+
+    def within(self, lat, lon, miles):
+        """
+        Returns the stations at most miles away from a point.
+
+        Returns:
+            lst: (miles, station id) tuples, closest first
+        """
+
+        dlat = miles / MILES_PER_DEGREE
+        dlon = miles / (MILES_PER_DEGREE * max(0.01,
+            math.cos(math.radians(min(89.0, abs(lat) + dlat)))))
+
+        with self.lock:
+            found = []
+            for i in self._cells_in(lat - dlat, lon - dlon, lat + dlat, lon + dlon):
+                distance = haversine_miles(lat, lon, *self.points[i])
+                if distance <= miles:
+                    found.append((distance, i))
+
+        found.sort()
+        return found
+
+    def _ring(self, row, col, ring):
+        """
+        Ids in the cells ring cells away from (row, col), within self.bounds.
+        Once that is more cells than are occupied, the ids of every cell at
+        least ring cells away are returned instead, with True.
+
+        Returns:
+            tuple: (ids, whether they are the last ring)
+        """
+
+        first_row, last_row, first_col, last_col = self.bounds
+        rows = [r for r in {row - ring, row + ring} if first_row <= r <= last_row]
+        cols = [c for c in {col - ring, col + ring} if first_col <= c <= last_col]
+        col0, col1 = max(col - ring, first_col), min(col + ring, last_col)
+        row0, row1 = max(row - ring + 1, first_row), min(row + ring - 1, last_row)
+
+        if len(rows) * (col1 - col0 + 1) + len(cols) * (row1 - row0 + 1) > \
+            len(self.cells):
+            return [i for (r, c), ids in self.cells.items()
+                if max(abs(r - row), abs(c - col)) >= ring for i in ids], True
+
+        cells = [self.cells.get((r, c), ()) for r in rows
+            for c in range(col0, col1 + 1)]
+        cells += [self.cells.get((r, c), ()) for c in cols
+            for r in range(row0, row1 + 1)]
+
+        return [i for ids in cells for i in ids], False
+
+    def _beyond(self, lat, lon, row, col, ring):
+        '''Fewest miles from a point to a station more than ring cells away'''
+
+        first_row, last_row, first_col, last_col = self.bounds
+        south, north = (row - ring) * self.cell, (row + ring + 1) * self.cell
+        west, east = (col - ring) * self.cell, (col + ring + 1) * self.cell
+        miles = float('inf')
+
+        # stations south or north of the rings are that much latitude away
+        if first_row < row - ring:
+            miles = min(miles, (lat - south) * MILES_PER_DEGREE)
+        if last_row > row + ring:
+            miles = min(miles, (north - lat) * MILES_PER_DEGREE)
+
+        # the others are west or east of them, on the rows the rings span
+        south = max(south, first_row * self.cell)
+        north = min(north, (last_row + 1) * self.cell)
+        dlon = min(lon - west if first_col < col - ring else float('inf'),
+            east - lon if last_col > col + ring else float('inf'))
+
+        if south < north and dlon < float('inf'):
+            top = math.radians(max(abs(south), abs(north)))
+            a = max(0.0, math.cos(math.radians(lat)) * math.cos(top)) * \
+                math.sin(math.radians(min(180.0, dlon)) / 2) ** 2
+            miles = min(miles, 2 * EARTH_RADIUS_MILES * math.asin(math.sqrt(a)))
+
+        return miles
+
+    def nearest(self, lat, lon, k=5):
+        """
+        Returns the k stations closest to a point.
+
+        Rings of cells around the point are searched outwards, from the first
+        ring that reaches an occupied cell, until k stations were found that
+        are closer than anything beyond the ring could be. The rings are
+        clipped to the cells ever used, and the bound is taken from the
+        latitudes they span; once a ring has more cells than are occupied,
+        the remaining cells are scanned at once.
+
+        Returns:
+            lst: (miles, station id) tuples, closest first
+        """
+
+        with self.lock:
+            if not self.points:
+                return []
+
+            row, col = self._cell(lat, lon)
+            first_row, last_row, first_col, last_col = self.bounds
+            # rings needed to reach the nearest and the farthest occupied cell
+            first = max(0, first_row - row, row - last_row, first_col - col,
+                col - last_col)
+            last = max(abs(row - first_row), abs(row - last_row),
+                abs(col - first_col), abs(col - last_col))
+
+            best = [] # max heap of (-miles, station id)
+
+            for ring in range(first, last + 1):
+                ids, rest = self._ring(row, col, ring)
+
+                for i in ids:
+                    item = (-haversine_miles(lat, lon, *self.points[i]), i)
+                    if len(best) < k:
+                        heapq.heappush(best, item)
+                    elif item > best[0]:
+                        heapq.heapreplace(best, item)
+
+                if rest or len(best) == k and \
+                    -best[0][0] <= self._beyond(lat, lon, row, col, ring):
+                    break
+
+        return sorted((-distance, i) for distance, i in best)
+
+    def cheapest(self, lat, lon, miles, fuel='regular', n=5):
+        """
+        Returns the cheapest stations for a fuel at most miles away.
+
+        Args:
+            lat (float): latitude of the point.
+            lon (float): longitude of the point.
+            miles (float): search radius.
+            fuel (str, optional): one of records.FUELS.
+            n (int, optional): stations returned.
+
+        Returns:
+            lst: (cents, miles, station id) tuples, cheapest first
+        """
+
+        column = FUELS.index(fuel)
+        found = []
+
+        for distance, i in self.within(lat, lon, miles):
+            cents = self.prices.get(i)
+            if cents is not None and cents[column] != MISSING:
+                found.append((cents[column], distance, i))
+
+        return heapq.nsmallest(n, found)
@@ -0,0 +1,59 @@
+# Python 3.7.1 - tests of the command line entry point, run with pytest
+
+import os
+import subprocess
+import sys
+
+import main
+from benchmark_startup import STARTUPS, startup_ms
+from pricestore import PriceStore
+from records import GasPrices
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BUDGET_MS = 100 # export and query startup over a bare python
+
+def stored_prices(fp):
+    '''A store in fp with one station of 85364'''
+
+    with PriceStore(fp) as store:
+        store.add_prices('85364', 'Chevron, 1825 S 4th Ave, Yuma, AZ 85364',
+            GasPrices('3.30', '2.90', '3.10', '3.40'))
+
+    return fp
+
+def imported(argv):
+    '''Modules of the driver stack main.main(argv) imported'''
+
+    code = ('import sys, main; main.main({!r}); print(" ".join(name for name '
+        'in ("selenium", "helpfuncs", "browser", "waits") '
+        'if name in sys.modules))').format(argv)
+    result = subprocess.run([sys.executable, '-c', code], cwd=HERE, check=True,
+        stdout=subprocess.PIPE, universal_newlines=True)
+
+    return result.stdout.splitlines()[-1].split() if result.stdout else []
+
+def test_query_does_not_import_the_driver_stack(tmp_path):
+    fp = stored_prices(str(tmp_path))
+
+    assert imported(['--fp', fp, 'query', '85364']) == []
+
+def test_export_does_not_import_the_driver_stack(tmp_path):
+    fp = stored_prices(str(tmp_path))
+
+    assert imported(['--fp', fp, 'export']) == []
+    assert os.path.isfile(os.path.join(fp, '85364', 'regular.csv'))
+
+def test_export_of_an_unknown_zipcode(tmp_path, capsys):
+    fp = stored_prices(str(tmp_path))
+
+    main.main(['--fp', fp, 'export', '99999'])
+
+    assert 'No prices stored for zip code 99999' in capsys.readouterr().out
+    assert not os.path.exists(os.path.join(fp, '99999'))
+
+def test_startup_time():
+    startups = dict(STARTUPS)
+    python = startup_ms(startups['python'], 3)
+
+    for command in ('main.py export', 'main.py query'):
+        assert startup_ms(startups[command], 3) - python < BUDGET_MS, command
@@ -0,0 +1,157 @@
+# Python 3.7.1 - event driven waits with timeouts learned from past waits
+
+import threading
+from time import perf_counter
+
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import NoSuchElementException
+from selenium.common.exceptions import StaleElementReferenceException
+from selenium.common.exceptions import TimeoutException
+
+# fixed timeouts the scrapers used before, now the longest a wait may take
+TIMEOUTS = dict(
+    clickable=3, # search field ready to be cleared
+    search=6, # search results url (data=!) after a zip code search
+    results=3, # first page of search results
+    next_page=5, # results page replaced after clicking next
+    place=5, # gas prices of a searched station
+    info=2, # address line of a place page
+)
+
+def first_of(*conditions):
+    """
+    Combines expected conditions into one that is met as soon as any of them
+    is, checking them all on every poll instead of one after another.
+
+    Returns:
+        callable: returns (index of the condition met, its value) or False
+    """
+
+    def condition(driver):
+        for i, check in enumerate(conditions):
+            try:
+                value = check(driver)
+            except (NoSuchElementException, StaleElementReferenceException):
+                continue
+            if value:
+                return i, value
+        return False
+
+    return condition
+
+def url_changed(url, contains=''):
+    '''Met once the url is no longer url and contains contains'''
+
+    def condition(driver):
+        current = driver.current_url
+        return current != url and contains in current and current
+
+    return condition
+
+def results_replaced(old_row, class_name='section-result'):
+    """
+    Met once old_row (a results row of the previous page) is detached from
+    the document and new rows are listed; returns the new rows.
+    """
+
+    stale = EC.staleness_of(old_row)
+
+    def condition(driver):
+        return stale(driver) and driver.find_elements_by_class_name(class_name)
+
+    return condition
+
+class AdaptiveTimeout:
+    """
+    Timeout of one kind of wait learned from how long the waits that
+    succeeded took: factor times their percentile, between floor and
+    ceiling. Until samples waits have been seen, ceiling is used.
+
+    Args:
+        ceiling (float): longest timeout, the old fixed value.
+        floor (float, optional): shortest timeout.
+        percentile (float, optional): of recent successful waits.
+        factor (float, optional): margin over that percentile.
+        samples (int, optional): waits needed before adapting.
+        window (int, optional): recent waits remembered.
+    """
+
+    def __init__(self, ceiling, floor=0.5, percentile=0.99, factor=2,
+        samples=20, window=200):
+        self.ceiling = ceiling
+        self.floor = min(floor, ceiling)
+        self.percentile = percentile
+        self.factor = factor
+        self.samples = samples
+        self.window = window
+        self.lock = threading.Lock()
+        self.seconds = [] # last window successful waits, oldest first
+        self.timeout = ceiling
+
+    def record(self, seconds):
+        with self.lock:
+            self.seconds.append(seconds)
+            del self.seconds[:-self.window]
+
+            if len(self.seconds) >= self.samples:
+                ordered = sorted(self.seconds)
+                tail = ordered[int(self.percentile * (len(ordered) - 1))]
+                self.timeout = min(self.ceiling,
+                    max(self.floor, self.factor * tail))
+
+    def timed_out(self):
+        '''A wait ran out: lengthen the timeout by half, up to the ceiling'''
+
+        with self.lock:
+            self.timeout = min(self.ceiling, self.timeout * 1.5)
+
+class Waits:
+    """
+    WebDriverWait replacement that polls several conditions at once and
+    adapts every kind of wait's timeout to the latencies it observes.
+
+    Args:
+        timeouts (dict, optional): {kind: ceiling seconds}, see TIMEOUTS.
+        poll (float, optional): seconds between polls.
+    """
+
+    def __init__(self, timeouts=TIMEOUTS, poll=0.05, **timeout_kwargs):
+        self.poll = poll
+        self.timeouts = {kind: AdaptiveTimeout(ceiling, **timeout_kwargs)
+            for kind, ceiling in timeouts.items()}
+
+    def until(self, driver, kind, *conditions):
+        """
+        Waits until the first of conditions is met.
+
+        Args:
+            driver (WebDriver): driver to poll.
+            kind (str): key of TIMEOUTS whose timeout applies.
+            *conditions (callable): expected conditions to race.
+
+        Returns:
+            tuple: (index of the condition met, its value)
+
+        Raises:
+            TimeoutException: no condition was met in time
+        """
+
+        timeout = self.timeouts[kind]
+        started = perf_counter()
+
+        try:
+            met = WebDriverWait(driver, timeout.timeout, self.poll).until(
+                first_of(*conditions)
+            )
+        except TimeoutException:
+            timeout.timed_out()
+            raise
+
+        timeout.record(perf_counter() - started)
+        return met
+
+    def current(self):
+        '''Returns {kind: timeout seconds in use}'''
+
+        return {kind: t.timeout for kind, t in self.timeouts.items()}
@@ -0,0 +1,296 @@
+# Python 3.7.1 - sqlite work queue for sharding tours across processes
+
+import argparse
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+from time import sleep, time
+
+from checkpoint import read_lines
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS stations (
+    address TEXT PRIMARY KEY,
+    state TEXT NOT NULL DEFAULT 'todo', -- todo, leased, done, failed
+    worker TEXT,
+    lease_until REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT, -- json of the scraped prices and coordinates
+    updated REAL
+)
+'''
+
+class WorkQueue:
+    """
+    Station queue in a sqlite file that any number of worker processes, on
+    this or other machines sharing the volume, take leases from.
+
+    A worker claims a few stations at a time for lease seconds. Stations it
+    reports are marked done; stations whose lease ran out (the worker died)
+    go back to the queue, and after max_attempts leases they are marked
+    failed.
+
+    Args:
+        fp (str): sqlite database file.
+        lease (int, optional): seconds a claim is valid for.
+        max_attempts (int, optional): leases before a station is failed.
+    """
+
+    def __init__(self, fp, lease=300, max_attempts=3):
+        self.fp = fp
+        self.lease = lease
+        self.max_attempts = max_attempts
+        # isolation_level=None: transactions are started explicitly
+        self.db = sqlite3.connect(fp, timeout=30, isolation_level=None)
+        self.db.execute(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def load(self, addresses):
+        '''Adds addresses to the queue; ones already queued are kept as is'''
+
+        with self.transaction():
+            self.db.executemany(
+                'INSERT OR IGNORE INTO stations (address, updated) VALUES (?, ?)',
+                [(address, time()) for address in addresses]
+            )
+
+    def reset(self):
+        '''Puts every station back in the queue for a new tour'''
+
+        with self.transaction():
+            self.db.execute(
+                "UPDATE stations SET state = 'todo', worker = NULL, "
+                "lease_until = NULL, attempts = 0, updated = ?", (time(),)
+            )
+
+    def transaction(self):
+        return Transaction(self.db)
+
+    def claim(self, worker, n=1):
+        """
+        Leases up to n stations to worker, least attempted stations first.
+        Leases that ran out are put back in the queue first.
+
+        Returns:
+            lst: addresses now leased to worker
+        """
+
+        now = time()
+
+        with self.transaction():
+            # leases of dead workers: back to the queue or failed
+            self.db.execute(
+                "UPDATE stations SET state = CASE WHEN attempts >= ? "
+                "THEN 'failed' ELSE 'todo' END, worker = NULL "
+                "WHERE state = 'leased' AND lease_until < ?",
+                (self.max_attempts, now)
+            )
+
+            rows = self.db.execute(
+                "SELECT address FROM stations WHERE state = 'todo' "
+                "ORDER BY attempts, updated LIMIT ?", (n,)
+            ).fetchall()
+            addresses = [row[0] for row in rows]
+
+            self.db.executemany(
+                "UPDATE stations SET state = 'leased', worker = ?, "
+                "lease_until = ?, attempts = attempts + 1, updated = ? "
+                "WHERE address = ?",
+                [(worker, now + self.lease, now, a) for a in addresses]
+            )
+
+        return addresses
+
+    def complete(self, worker, address, result):
+        """
+        Reports a scraped station. Ignored if the lease was lost to another
+        worker in the meantime, so a station is never recorded twice.
+
+        Returns:
+            bool: True if the result was recorded
+        """
+
+        with self.transaction():
+            cursor = self.db.execute(
+                "UPDATE stations SET state = 'done', result = ?, updated = ? "
+                "WHERE address = ? AND worker = ? AND state = 'leased'",
+                (json.dumps(result), time(), address, worker)
+            )
+            return cursor.rowcount == 1
+
+    def release(self, worker, address):
+        '''Gives a leased station back, e.g. after it failed to load'''
+
+        with self.transaction():
+            self.db.execute(
+                "UPDATE stations SET state = CASE WHEN attempts >= ? "
+                "THEN 'failed' ELSE 'todo' END, worker = NULL, updated = ? "
+                "WHERE address = ? AND worker = ? AND state = 'leased'",
+                (self.max_attempts, time(), address, worker)
+            )
+
+    def counts(self):
+        '''Returns {state: number of stations}'''
+
+        return dict(self.db.execute(
+            'SELECT state, COUNT(*) FROM stations GROUP BY state'
+        ).fetchall())
+
+    def remaining(self):
+        '''Number of stations not done or failed yet'''
+
+        counts = self.counts()
+        return counts.get('todo', 0) + counts.get('leased', 0)
+
+class Transaction:
+    '''BEGIN IMMEDIATE ... COMMIT, so claims by two workers never overlap'''
+
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        self.db.execute('BEGIN IMMEDIATE')
+
+    def __exit__(self, exc_type, *exc):
+        self.db.execute('COMMIT' if exc_type is None else 'ROLLBACK')
+
+def work(fp, worker, batch=5, lease=300, driver_factory=None, max_window=False,
+    dims=(1080,800), prices_fp='fuel_prices', metrics_fp=None):
+    """
+    Worker process: claims stations from the queue at fp and checks them
+    until the queue is empty.
+
+    Every worker shares the price store, place cache and registry in
+    prices_fp. The cache and registry are saved inside a queue transaction,
+    which no other worker can hold at the same time, each merging what the
+    other workers saved before it.
+
+    Args:
+        fp (str): sqlite database file.
+        worker (str): unique name of this worker.
+        batch (int, optional): stations claimed at a time.
+        lease (int, optional): seconds a claim is valid for.
+        driver_factory (callable, optional): returns a new driver.
+        prices_fp (str, optional): folder of the prices, cache and registry.
+        metrics_fp (str, optional): exports the metrics of this worker to
+            '{metrics_fp}_{worker}.prom' and '.json' after every batch.
+    """
+
+    from selenium.common.exceptions import WebDriverException
+    from helpfuncs import GasPriceChecker # only workers need selenium
+    from metrics import Metrics
+    from placecache import PlaceCache
+    from pricestore import PriceStore
+    from registry import StationRegistry
+
+    queue = WorkQueue(fp, lease)
+    checker = GasPriceChecker(
+        'https://www.google.com/maps', GasPriceChecker.xpaths, os.devnull,
+        driver_factory, store=PriceStore(prices_fp), place_cache=PlaceCache(
+            os.path.join(prices_fp, '_place_cache.json'), shared=True),
+        registry=StationRegistry(os.path.join(prices_fp, '_stations.json'),
+            shared=True),
+        metrics=Metrics(metrics_fp + '_' + worker) if metrics_fp else None
+    )
+    done = 0
+
+    try:
+        while True:
+            addresses = queue.claim(worker, batch)
+
+            if not addresses:
+                if queue.remaining() == 0:
+                    break
+                sleep(5) # others still hold leases that may expire
+                continue
+
+            for loc in addresses:
+                # a dead browser is retired; the next visit gets a new one
+                try:
+                    result = checker.session_visit(loc, max_window, dims)
+                except WebDriverException as e:
+                    print(loc, "lost its browser:", e.msg)
+                    result = None
+
+                if result is None:
+                    queue.release(worker, loc)
+                    continue
+
+                _, prices, geo = result
+                if queue.complete(worker, loc, dict(
+                    prices=list(prices.cents()), timestamp=prices.timestamp,
+                    lat=geo.lat, lon=geo.lon
+                )):
+                    checker.persist(loc, prices)
+                    done += 1
+
+            with queue.transaction(): # one worker merges and saves at a time
+                checker.flush()
+            checker.metrics.export()
+    finally:
+        checker.metrics.export()
+        checker.sessions.close()
+        queue.close()
+
+    print(worker, "checked", done, "stations.")
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Shards gas station checks across worker processes'
+    )
+    parser.add_argument('db', help='sqlite queue file, on a shared volume')
+    commands = parser.add_subparsers(dest='command')
+
+    load = commands.add_parser('load', help='queue an address file')
+    load.add_argument('addresses', help='text file with an address per line')
+    load.add_argument('--reset', action='store_true',
+        help='requeue every station for a new tour')
+
+    commands.add_parser('status', help='print station counts per state')
+
+    workers = commands.add_parser('work', help='start worker processes')
+    workers.add_argument('-n', '--workers', type=int, default=2)
+    workers.add_argument('--batch', type=int, default=5)
+    workers.add_argument('--lease', type=int, default=300)
+    workers.add_argument('--fp', default='fuel_prices',
+        help='folder of the prices, place cache and registry')
+    workers.add_argument('--metrics', metavar='PATH',
+        help='write stage timings and station counts of each worker to '
+        'PATH_{worker}.prom and .json')
+
+    args = parser.parse_args()
+
+    if args.command == 'load':
+        queue = WorkQueue(args.db)
+        queue.load(read_lines(args.addresses))
+        if args.reset:
+            queue.reset()
+        print(queue.counts())
+
+    elif args.command == 'status':
+        print(WorkQueue(args.db).counts())
+
+    elif args.command == 'work':
+        host = socket.gethostname()
+        processes = [
+            multiprocessing.Process(target=work, args=(
+                args.db, '{}-{}-{}'.format(host, os.getpid(), i),
+                args.batch, args.lease
+            ), kwargs=dict(prices_fp=args.fp, metrics_fp=args.metrics))
+            for i in range(args.workers)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        print(WorkQueue(args.db).counts())
+
+    else:
+        parser.print_help()
+
+if __name__ == '__main__':
+    main()